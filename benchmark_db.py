@@ -0,0 +1,106 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flaskr.db import connect
+
+# --- KONFIGURACJA ---
+THREADS = 8
+OPERATIONS_PER_THREAD = 500
+SCHEMA = os.path.join(os.path.dirname(__file__), "flaskr", "schema.sql")
+
+
+def create_database(journal_mode):
+    fd, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+
+    db = sqlite3.connect(path)
+    with open(SCHEMA) as f:
+        db.executescript(f.read())
+    db.execute(f"PRAGMA journal_mode = {journal_mode}")
+    db.execute("INSERT INTO user (username, password) VALUES (?, ?)", ("bench", "x"))
+    db.commit()
+    db.close()
+    return path
+
+
+def operation(db, thread_id, i):
+    """Mieszanka jak w aplikacji: zapis recenzji + odczyt strony głównej."""
+    db.execute(
+        "INSERT INTO post (title, body, author_id) VALUES (?, ?, ?)",
+        (f"title {thread_id}-{i}", "body", 1),
+    )
+    db.commit()
+    db.execute(
+        "SELECT p.id, title, body, created, author_id, username"
+        " FROM post p JOIN user u ON p.author_id = u.id"
+        " ORDER BY created DESC LIMIT 10"
+    ).fetchall()
+
+
+def worker_fresh(path, thread_id, count, errors):
+    """Stare zachowanie: nowe połączenie na każde żądanie."""
+    for i in range(count):
+        db = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+        db.row_factory = sqlite3.Row
+        try:
+            operation(db, thread_id, i)
+        except sqlite3.OperationalError:
+            errors.append(1)
+        finally:
+            db.close()
+
+
+def worker_pooled(path, thread_id, count, errors):
+    """Nowe zachowanie: jedno połączenie na wątek, WAL i pragmy z flaskr.db."""
+    db = connect(path)
+    for i in range(count):
+        try:
+            operation(db, thread_id, i)
+        except sqlite3.OperationalError:
+            errors.append(1)
+    db.close()
+
+
+def run(name, worker, journal_mode, threads, count):
+    path = create_database(journal_mode)
+    errors = []
+
+    pool = [
+        threading.Thread(target=worker, args=(path, t, count, errors))
+        for t in range(threads)
+    ]
+    start_time = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    duration = time.perf_counter() - start_time
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+    ops = threads * count
+    print(
+        f"{name:<28} {ops / duration:10.1f} ops/s"
+        f"  ({duration:.2f}s, {len(errors)} błędów 'database is locked')"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmark połączeń SQLite")
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--operations", type=int, default=OPERATIONS_PER_THREAD)
+    args = parser.parse_args()
+
+    print(f"--- {args.threads} wątków x {args.operations} operacji ---")
+    run("fresh connect, DELETE", worker_fresh, "DELETE", args.threads, args.operations)
+    run("per-thread pool, WAL", worker_pooled, "WAL", args.threads, args.operations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import io
+import time
+
+from PIL import Image, ImageDraw
+
+from flaskr import imaging
+
+# --- KONFIGURACJA ---
+SIZE = (1280, 960)
+RADIUS = 10
+RUNS = 3
+# Warianty zapisu: (format, opcje ENCODER); pierwszy = punkt odniesienia
+# (dotychczasowe zachowanie - PNG z domyślnymi ustawieniami)
+BASE_ENCODER = dict(
+    quality=80, webp_method=4, jpeg_progressive=True, png_compress_level=6
+)
+VARIANTS = [
+    ("PNG", {}),
+    ("PNG", {"png_compress_level": 1}),
+    ("JPEG", {"quality": 70}),
+    ("JPEG", {"quality": 80}),
+    ("JPEG", {"quality": 90}),
+    ("WEBP", {"webp_method": 0}),
+    ("WEBP", {"webp_method": 4}),
+    ("WEBP", {"webp_method": 6}),
+    ("WEBP", {"quality": 60}),
+]
+
+
+def make_photo(size):
+    """Coś w rodzaju zdjęcia: gradient nieba, szum i kilka kształtów."""
+    width, height = size
+    sky = Image.linear_gradient("L").resize(size).convert("RGB")
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    img = Image.blend(sky, noise, 0.3)
+
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x, y = (i * 97) % width, (i * 53) % height
+        draw.ellipse(
+            (x, y, x + width // 6, y + height // 6), fill=(200, 40 * i % 255, 90)
+        )
+
+    return img
+
+
+def make_animation(size, frames=8):
+    return [Image.effect_noise(size, 20 + i * 5).convert("P") for i in range(frames)]
+
+
+def measure(img, format, encoder, frames=(), durations=None, runs=RUNS):
+    """Zwraca (bajty, najlepszy czas zapisu w ms)."""
+    best = None
+    for _ in range(runs):
+        out = io.BytesIO()
+        start = time.perf_counter()
+        imaging.encode(img, out, format, encoder, frames, durations)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return out.tell(), best
+
+
+def report(title, rows):
+    print(f"\n--- {title} ---")
+    base_bytes, base_ms = rows[0][1], rows[0][2]
+    print(f"{'wariant':<28} {'KiB':>9} {'oszczędność':>12} {'ms':>9} {'CPU':>7}")
+    for name, size, ms in rows:
+        saved = 100 * (1 - size / base_bytes)
+        print(
+            f"{name:<28} {size / 1024:9.1f} {saved:11.1f}% {ms:9.1f} "
+            f"{ms / base_ms:6.2f}x"
+        )
+
+    # Najmniejszy plik wśród wariantów nie wolniejszych niż punkt odniesienia
+    cheaper = [row for row in rows[1:] if row[2] <= base_ms] or rows[1:]
+    name, size, ms = min(cheaper, key=lambda row: row[1])
+    print(f"🏆 {name}: {size / 1024:.1f} KiB w {ms:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rozmiar wyniku vs czas zapisu")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    with imaging.blur(make_photo(SIZE), radius=RADIUS) as blurred:
+        rows = []
+        for format, options in VARIANTS:
+            encoder = {**BASE_ENCODER, **options}
+            size, ms = measure(blurred, format, encoder, runs=args.runs)
+            label = ", ".join(f"{k}={v}" for k, v in options.items())
+            rows.append((f"{format} {label}".strip(), size, ms))
+        report(f"Rozmyte zdjęcie {SIZE[0]}x{SIZE[1]}", rows)
+
+    # Animowany GIF: klatka po klatce, zapis jako GIF albo animowany WEBP
+    buf = io.BytesIO()
+    source = make_animation((320, 240))
+    source[0].save(buf, format="GIF", save_all=True, append_images=source[1:])
+    buf.seek(0)
+    with imaging.decode(buf) as img:
+        frames, durations = imaging.blur_frames(img, radius=RADIUS // 2)
+
+    rows = []
+    for format in ("GIF", "WEBP"):
+        size, ms = measure(
+            frames[0], format, BASE_ENCODER, frames[1:], durations, args.runs
+        )
+        rows.append((format, size, ms))
+    report(f"Animacja {len(frames)} klatek 320x240", rows)
+
+
+if __name__ == "__main__":
+    main()
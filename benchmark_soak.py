@@ -0,0 +1,102 @@
+import argparse
+import io
+import random
+import subprocess
+import sys
+
+# --- KONFIGURACJA ---
+TASKS = 10000
+CHECKPOINTS = 20
+# Rozmiary obrazów jak z prawdziwych uploadów - różne, żeby arena musiała
+# obsłużyć różne klasy rozmiarów
+SIZES = [(320, 240), (640, 480), (800, 600), (1024, 768), (1280, 720)]
+ARENA = dict(blocks_max=64, block_size=4 * 1024**2)
+
+
+def rss_kib():
+    """Aktualne (nie szczytowe) RSS procesu z /proc."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * 4
+
+
+def make_inputs(seed=0):
+    from PIL import Image
+
+    random.seed(seed)
+    inputs = []
+    for size in SIZES:
+        img = Image.effect_noise(size, 64).convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        inputs.append(buf.getvalue())
+    return inputs
+
+
+def soak(tasks, use_arena):
+    """Ten sam silnik co worker (flaskr.imaging), bez sleep i bez dysku."""
+    from flaskr import imaging
+
+    if use_arena:
+        imaging.configure_arena(**ARENA)
+
+    inputs = make_inputs()
+    every = max(tasks // CHECKPOINTS, 1)
+
+    for i in range(1, tasks + 1):
+        data = random.choice(inputs)
+        with imaging.decode(io.BytesIO(data)) as img:
+            with imaging.blur(img) as blurred:
+                imaging.encode(blurred, io.BytesIO(), "PNG")
+        if i % every == 0:
+            print(i, rss_kib(), flush=True)
+
+
+def run_mode(tasks, use_arena):
+    """Każdy tryb w osobnym procesie - czysty start sterty."""
+    res = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--child",
+            "--tasks",
+            str(tasks),
+            *(["--arena"] if use_arena else []),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [tuple(map(int, line.split())) for line in res.stdout.splitlines()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test pamięci workera")
+    parser.add_argument("--tasks", type=int, default=TASKS)
+    parser.add_argument("--arena", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        soak(args.tasks, args.arena)
+        return
+
+    print(f"--- SOAK: {args.tasks} zadań, RSS w MiB ---")
+    results = {
+        "bez areny": run_mode(args.tasks, False),
+        "z areną": run_mode(args.tasks, True),
+    }
+
+    print(f"{'zadania':>8} " + " ".join(f"{name:>10}" for name in results))
+    for row in zip(*results.values()):
+        line = " ".join(f"{rss / 1024:10.1f}" for _, rss in row)
+        print(f"{row[0][0]:8d} {line}")
+
+    # Wzrost między pierwszym a ostatnim punktem pomiaru - powinien być ~0
+    for name, points in results.items():
+        growth = (points[-1][1] - points[0][1]) / 1024
+        print(f"{name}: wzrost RSS {growth:+.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
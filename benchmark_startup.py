@@ -0,0 +1,85 @@
+import argparse
+import subprocess
+import sys
+
+# --- KONFIGURACJA ---
+# Co uruchamia zimny kontener web i worker (autoskalowanie = dużo zimnych startów)
+SCENARIOS = {
+    "web": "from flaskr import create_app; create_app()",
+    "worker": "import flaskr.celery_worker",
+}
+# Moduły, które nie powinny być ładowane przy starcie danego procesu
+FORBIDDEN = {
+    "web": ["PIL"],
+    "worker": ["flaskr.review", "flaskr.auth", "flaskr.image"],
+}
+TOP_IMPORTS = 10
+
+
+def measure(code):
+    """
+    Uruchamia `code` w świeżym interpreterze z -X importtime.
+    Zwraca (czas importów w ms, {pakiet najwyższego poziomu: ms}, moduły).
+    """
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us = 0
+    top_level = {}
+    modules = set()
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        # Po "|" jest jedna spacja, każde kolejne wcięcie = import zagnieżdżony
+        name = name[1:]
+        module = name.strip()
+        modules.add(module)
+        total_us += int(self_us)
+        if not name.startswith(" "):
+            top_level[module] = int(cumulative_us) / 1000
+
+    return total_us / 1000, top_level, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Czas importów przy zimnym starcie")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="budżet czasu importów; przekroczenie kończy skrypt kodem 1",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+
+    for scenario, code in SCENARIOS.items():
+        runs = [measure(code) for _ in range(args.runs)]
+        # Najlepszy z kilku przebiegów - najmniej szumu od dysku i cache
+        total_ms, top_level, modules = min(runs, key=lambda run: run[0])
+
+        print(f"\n--- {scenario}: {total_ms:.1f} ms importów ---")
+        slowest = sorted(top_level.items(), key=lambda item: -item[1])
+        for module, ms in slowest[:TOP_IMPORTS]:
+            print(f"   {ms:8.1f} ms  {module}")
+
+        for module in FORBIDDEN[scenario]:
+            if module in modules:
+                print(f"❌ {scenario} ładuje {module} przy starcie")
+                failed = True
+
+        if args.max_ms is not None and total_ms > args.max_ms:
+            print(f"❌ {scenario}: {total_ms:.1f} ms > budżet {args.max_ms} ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
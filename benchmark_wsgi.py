@@ -0,0 +1,115 @@
+import argparse
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+# --- KONFIGURACJA ---
+# Porównujemy serwer deweloperski (docker-compose --profile dev up, port 5001)
+# z profilem produkcyjnym gunicorn (port 5000).
+DEFAULT_TARGETS = ["dev=http://localhost:5001", "prod=http://localhost:5000"]
+REQUESTS_PER_ENDPOINT = 500
+CONCURRENCY = 32
+
+
+def generate_image():
+    """Mały obrazek PNG w pamięci - mierzymy serwer, a nie transfer."""
+    img_byte_arr = io.BytesIO()
+    Image.new("RGB", (64, 64), color=(30, 30, 30)).save(img_byte_arr, format="PNG")
+    return img_byte_arr.getvalue()
+
+
+_local = threading.local()
+
+
+def get_session():
+    """Jedna sesja (pula połączeń keep-alive) na wątek klienta."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def upload(base_url, image):
+    res = get_session().post(
+        f"{base_url}/image/upload", files={"file": ("bench.png", image, "image/png")}
+    )
+    return res.status_code == 202, res
+
+
+def status(base_url, task_id):
+    res = get_session().get(f"{base_url}/image/status/{task_id}")
+    return res.status_code == 200, res
+
+
+def measure(name, func, count, concurrency):
+    """Wykonuje `func` `count` razy równolegle i zwraca req/s."""
+    errors = 0
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ok, _ in pool.map(lambda _: func(), range(count)):
+            if not ok:
+                errors += 1
+
+    duration = time.perf_counter() - start_time
+    rps = count / duration
+    print(f"   {name:<16} {rps:8.1f} req/s  ({errors} błędów, {duration:.2f}s)")
+    return rps
+
+
+def run_target(label, base_url, count, concurrency):
+    print(f"\n🎯 {label}: {base_url}")
+    image = generate_image()
+
+    ok, res = upload(base_url, image)
+    if not ok:
+        print(f"❌ Upload nie działa: {res.status_code} {res.text[:200]}")
+        return None
+    task_id = res.json()["task_id"]
+
+    return {
+        "upload": measure(
+            "/image/upload", lambda: upload(base_url, image), count, concurrency
+        ),
+        "status": measure(
+            "/image/status", lambda: status(base_url, task_id), count, concurrency
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porównanie przepustowości WSGI")
+    parser.add_argument(
+        "--target",
+        action="append",
+        help="etykieta=URL, np. prod=http://localhost:5000 (można powtarzać)",
+    )
+    parser.add_argument("--requests", type=int, default=REQUESTS_PER_ENDPOINT)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+
+    print("--- START BENCHMARKU WSGI ---")
+    print("⚠️  Każdy upload trafia do kolejki - po teście warto wyczyścić RabbitMQ.")
+
+    results = {}
+    for target in args.target or DEFAULT_TARGETS:
+        label, base_url = target.split("=", 1)
+        try:
+            result = run_target(label, base_url, args.requests, args.concurrency)
+        except requests.ConnectionError as e:
+            print(f"❌ Nie można połączyć się z {base_url}: {e}")
+            continue
+        if result:
+            results[label] = result
+
+    print("\n--- PODSUMOWANIE (req/s) ---")
+    print(f"{'':<8} {'upload':>10} {'status':>10}")
+    for label, result in results.items():
+        print(f"{label:<8} {result['upload']:10.1f} {result['status']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
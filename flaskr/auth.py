@@ -12,10 +12,33 @@ from flask import (
 )
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from flaskr.cache import get_cache
 from flaskr.db import get_db
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
+# Te endpointy nie potrzebują zalogowanego użytkownika
+ANONYMOUS_BLUEPRINTS = {"health"}
+
+
+def invalidate_user(user_id):
+    """Forget the cached row of ``user_id``, e.g. after a password change."""
+    get_cache("USER_CACHE").invalidate(user_id)
+
+
+def load_user(user_id):
+    cache = get_cache("USER_CACHE")
+    user = cache.get(user_id)
+
+    if user is None:
+        row = get_db().execute("SELECT * FROM user WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        cache.set(user_id, user)
+
+    return user
+
 
 @bp.route("/register", methods=("GET", "POST"))
 def register():
@@ -32,11 +55,12 @@ def register():
 
         if error is None:
             try:
-                db.execute(
+                cursor = db.execute(
                     "INSERT INTO user (username, password) VALUES (?, ?)",
                     (username, generate_password_hash(password)),
                 )
                 db.commit()
+                invalidate_user(cursor.lastrowid)
             except db.IntegrityError:
                 error = f"User {username} is already registered."
             else:
@@ -77,16 +101,21 @@ def login():
 def load_logged_in_user():
     user_id = session.get("user_id")
 
-    if user_id is None:
+    if (
+        user_id is None
+        or request.endpoint == "static"
+        or request.blueprint in ANONYMOUS_BLUEPRINTS
+    ):
         g.user = None
     else:
-        g.user = (
-            get_db().execute("SELECT * FROM user WHERE id = ?", (user_id,)).fetchone()
-        )
+        g.user = load_user(user_id)
 
 
 @bp.route("/logout")
 def logout():
+    user_id = session.get("user_id")
+    if user_id is not None:
+        invalidate_user(user_id)
     session.clear()
     return redirect(url_for("index"))
 
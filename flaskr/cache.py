@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class TTLCache:
+    """
+    Per-process LRU cache whose entries expire after ``ttl`` seconds.
+
+    Writers invalidate entries explicitly in their own process; the TTL
+    bounds how long other processes can serve a stale value.
+    """
+
+    def __init__(self, size=1024, ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_cache(name):
+    """Return the app's cache ``name``, configured by ``app.config[name]``."""
+    cache = current_app.extensions.get(name)
+
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            name, TTLCache(**current_app.config[name])
+        )
+
+    return cache
@@ -1,4 +1,9 @@
-from flaskr import create_app
+from flaskr import create_worker_app, imaging, jobs
 
-flask_app = create_app()
+flask_app = create_worker_app()
 celery_app = flask_app.extensions["celery"]
+
+# Worker zapisuje start/koniec zadań do tabeli job (paczkami)
+jobs.init_worker(flask_app)
+# Arena buforów obrazów w każdym procesie potomnym
+imaging.init_worker(flask_app)
@@ -1,16 +1,80 @@
+import fcntl
+import os
 import sqlite3
+import threading
 from datetime import datetime
 
 import click
 from flask import current_app, g
+from werkzeug.exceptions import abort
+
+from flaskr.forking import per_process
+
+# WAL pozwala czytać w trakcie zapisu, a NORMAL nie robi fsync przy każdym commicie
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA busy_timeout = 5000",
+)
+# Połączenia żyją długo, więc cache przygotowanych zapytań faktycznie działa
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(database, pragmas=PRAGMAS):
+    db = sqlite3.connect(
+        database,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    db.row_factory = sqlite3.Row
+
+    for pragma in pragmas:
+        db.execute(pragma)
+
+    return db
+
+
+class ConnectionPool:
+    """Keep one open connection per thread of the current process."""
+
+    def __init__(self, database):
+        self.database = database
+        self.pid = os.getpid()
+        self._local = threading.local()
+
+    def acquire(self):
+        db = getattr(self._local, "db", None)
+
+        if db is None:
+            db = self._local.db = connect(self.database)
+
+        return db
+
+    def release(self, db):
+        # Niezatwierdzone zmiany nie mogą przeciec do kolejnego żądania
+        if db.in_transaction:
+            db.rollback()
+
+
+def get_pool():
+    database = current_app.config["DATABASE"]
+
+    # Po forku (gunicorn) każdy proces otwiera własne połączenia
+    return per_process(
+        current_app.extensions,
+        "db_pool",
+        lambda: ConnectionPool(database),
+        stale=lambda pool: pool.database != database,
+    )
 
 
 def get_db():
     if "db" not in g:
-        g.db = sqlite3.connect(
-            current_app.config["DATABASE"], detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        if current_app.config["DATABASE_POOL"]:
+            g.db = get_pool().acquire()
+        else:
+            g.db = connect(current_app.config["DATABASE"])
 
     return g.db
 
@@ -18,16 +82,118 @@ def get_db():
 def close_db(e=None):
     db = g.pop("db", None)
 
-    if db is not None:
+    if db is None:
+        return
+
+    if current_app.config["DATABASE_POOL"]:
+        get_pool().release(db)
+    else:
         db.close()
 
 
+# Migracje schematu, stosowane po kolei; numer migracji = PRAGMA user_version
+MIGRATIONS = (
+    # 1: stronicowanie recenzji po (created, id) i wyszukiwanie po autorze
+    """
+    CREATE INDEX IF NOT EXISTS post_created_id ON post (created, id);
+    CREATE INDEX IF NOT EXISTS post_author_id ON post (author_id);
+    """,
+    # 2: historia zadań przetwarzania obrazów
+    """
+    CREATE TABLE IF NOT EXISTS job (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id TEXT UNIQUE NOT NULL,
+        user_id INTEGER,
+        filename TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        queue TEXT NOT NULL,
+        tier TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'PENDING',
+        input_bytes INTEGER NOT NULL,
+        output_bytes INTEGER,
+        output_filename TEXT,
+        enqueued TIMESTAMP NOT NULL,
+        started TIMESTAMP,
+        finished TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES user (id)
+    );
+    CREATE INDEX IF NOT EXISTS job_user_enqueued ON job (user_id, enqueued, id);
+    CREATE INDEX IF NOT EXISTS job_content_hash ON job (content_hash);
+    """,
+    # 3: operacja zadania i wyszukiwanie po wyniku (przyrostowe ponowne rozmycie)
+    """
+    ALTER TABLE job ADD COLUMN operation TEXT;
+    CREATE INDEX IF NOT EXISTS job_output_filename ON job (output_filename);
+    """,
+    # 4: uploady niezakończonych zadań (chronione przed eksmisją w sweep-storage)
+    """
+    CREATE INDEX IF NOT EXISTS job_unfinished ON job (filename)
+    WHERE finished IS NULL;
+    """,
+    # 5: wersje cache'owanych widoków, wspólne dla wszystkich procesów
+    """
+    CREATE TABLE IF NOT EXISTS cache_version (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO cache_version (name) VALUES ('index');
+    """,
+)
+
+
+def parse_cursor(cursor):
+    """Parse a ``<timestamp>_<id>`` page cursor into query parameters."""
+    try:
+        timestamp, id = cursor.rsplit("_", 1)
+        return str(datetime.fromisoformat(timestamp)), int(id)
+    except ValueError:
+        abort(400, "Invalid page cursor.")
+
+
+def migrate_db():
+    """Apply pending migrations and return the resulting schema version."""
+    db = get_db()
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, script in enumerate(MIGRATIONS[version:], version + 1):
+        db.executescript(script)
+        db.execute(f"PRAGMA user_version = {number}")
+
+    return len(MIGRATIONS)
+
+
+def upgrade_db():
+    """
+    Migrate an initialized database at startup; return the schema version.
+
+    A database without tables still needs ``init-db`` and is left alone.
+    The file lock keeps processes starting together from migrating twice.
+    """
+    # Samo połączenie utworzyłoby pusty plik bazy
+    if not os.path.exists(current_app.config["DATABASE"]):
+        return None
+
+    db = get_db()
+    initialized = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user'"
+    ).fetchone()
+
+    if initialized is None:
+        return None
+
+    with open(f"{current_app.config['DATABASE']}.migrate.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return migrate_db()
+
+
 def init_db():
     db = get_db()
 
     with current_app.open_resource("schema.sql") as f:
         db.executescript(f.read().decode("utf8"))
 
+    migrate_db()
+
 
 @click.command("init-db")
 def init_db_command():
@@ -36,6 +202,13 @@ def init_db_command():
     click.echo("Initialized the database.")
 
 
+@click.command("migrate-db")
+def migrate_db_command():
+    """Upgrade the schema of an existing database, keeping its data."""
+    version = migrate_db()
+    click.echo(f"Database schema at version {version}.")
+
+
 @click.command("seed-db")
 def seed_db_command():
     """Insert initial users and posts."""
@@ -90,4 +263,10 @@ sqlite3.register_converter("timestamp", lambda v: datetime.fromisoformat(v.decod
 def init_app(app):
     app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
     app.cli.add_command(seed_db_command)
+
+    # Nowe kolumny i tabele (np. job) muszą istnieć zanim przyjdzie pierwszy upload
+    if app.config["AUTO_MIGRATE"]:
+        with app.app_context():
+            upgrade_db()
@@ -0,0 +1,32 @@
+import os
+import threading
+
+_lock = threading.Lock()
+
+
+def per_process(store, key, factory, stale=None):
+    """
+    Return ``store[key]``, created with ``factory()`` once per process.
+
+    Connections, sockets and threads inherited through a fork (gunicorn,
+    Celery prefork) must never be reused, so an object whose ``pid`` is not
+    the current process is replaced. ``stale(obj)`` may ask for a new object
+    for other reasons, e.g. a changed setting.
+    """
+
+    def usable(obj):
+        return (
+            obj is not None
+            and obj.pid == os.getpid()
+            and not (stale is not None and stale(obj))
+        )
+
+    obj = store.get(key)
+
+    if not usable(obj):
+        with _lock:
+            obj = store.get(key)
+            if not usable(obj):
+                obj = store[key] = factory()
+
+    return obj
@@ -25,30 +25,59 @@ def healthz():
     return jsonify({"status": "ok"}), 200
 
 
+def get_checks(monitor):
+    """Database status plus the cached results of the dependency checks."""
+    checks = {"database": {"status": get_database_info()["status"]}}
+    checks.update(monitor.snapshot())
+    return checks
+
+
 @bp.route("/readyz")
 def readyz():
-    """Readiness probe — checks if the app is ready to serve traffic."""
-    if get_database_info()["status"] == "ok":
+    """
+    Readiness probe — checks if the app is ready to serve traffic.
+
+    Fails when the database or any of ``HEALTH["ready_checks"]`` (broker,
+    queue depth, disk headroom) is not ok, so the load balancer stops
+    sending uploads to a node that cannot process them. Checks that have
+    not run yet are tolerated during ``HEALTH["startup_grace"]``.
+    """
+    from .monitor import get_monitor
+
+    monitor = get_monitor()
+    checks = get_checks(monitor)
+    required = ("database", *current_app.config["HEALTH"]["ready_checks"])
+    # Tuż po starcie pierwsze sprawdzenia mogą jeszcze trwać
+    allowed = ("ok", "unknown") if monitor.starting() else ("ok",)
+    failed = [name for name in required if checks[name]["status"] not in allowed]
+
+    if not failed:
         return jsonify({"status": "ok"}), 200
-    return jsonify({"status": "error"}), 500
+    return jsonify({"status": "error", "failed": failed}), 500
 
 
 @bp.route("/health")
 def health():
     """
     Full health check — useful for monitoring.
-    Includes DB, can include more services in the future.
+    Includes DB, broker, queue depth, workers, disk and result store; all but
+    the database are served from the background monitor's last run.
     """
-    checks = {}
+    from .monitor import get_monitor
 
-    # Database check
-    checks["database"] = get_database_info()["status"]
+    details = get_checks(get_monitor())
+    checks = {name: result["status"] for name, result in details.items()}
 
-    overall_ok = all(value == "ok" for value in checks.values())
+    # "degraded" (np. wolny magazyn wyników) nie oznacza awarii
+    overall_ok = all(value in ("ok", "degraded") for value in checks.values())
 
-    return jsonify({"status": "ok" if overall_ok else "error", "checks": checks}), (
-        200 if overall_ok else 500
-    )
+    return jsonify(
+        {
+            "status": "ok" if overall_ok else "error",
+            "checks": checks,
+            "details": details,
+        }
+    ), (200 if overall_ok else 500)
 
 
 @bp.route("/info")
@@ -67,4 +96,8 @@ def info():
         "database": get_database_info(),
     }
 
+    publisher = current_app.extensions.get("publisher")
+    if publisher is not None:
+        result["publish"] = publisher.metrics.snapshot()
+
     return jsonify(result), 200
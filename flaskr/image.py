@@ -1,3 +1,6 @@
+import json
+import logging
+import mimetypes
 import os
 import uuid
 from flask import (
@@ -7,14 +10,38 @@ from flask import (
     url_for,
     current_app,
     jsonify,
-    send_from_directory,
+    send_file,
     render_template,
 )
+from werkzeug.exceptions import abort
 
+from flaskr.auth import login_required
+from flaskr.db import parse_cursor
+from flaskr.jobs import (
+    create_job,
+    delete_job,
+    find_job_by_output,
+    get_jobs,
+    set_job_status,
+)
+from flaskr.operations import (
+    DEFAULT_OPERATION,
+    OperationError,
+    can_patch,
+    changed_regions,
+    parse_operation,
+)
+from flaskr.producer import publish_task
+from flaskr.retention import file_digest, find_file, shard_path, tier_for_queue
+from flaskr.results import unpack_result
+from flaskr.status import log_sampled, read_states, wait_for_states, wait_slots
 from flaskr.tasks import process_image
 
 bp = Blueprint("image", __name__, url_prefix="/image")
 
+logger = logging.getLogger(__name__)
+status_logger = logging.getLogger("flaskr.image.status")
+
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
 
@@ -38,24 +65,24 @@ def upload_file():
         return jsonify({"error": "No selected file"}), 400
 
     if file and allowed_file(file.filename):
+        try:
+            operation = parse_operation(request.form.get("operation"))
+        except OperationError as e:
+            return jsonify({"error": str(e)}), 400
+
         ext = file.filename.rsplit(".", 1)[1].lower()
         unique_filename = f"{uuid.uuid4().hex}.{ext}"
-        upload_folder = os.path.join(current_app.instance_path, "uploads")
 
-        os.makedirs(upload_folder, exist_ok=True)
-        file.save(os.path.join(upload_folder, unique_filename))
+        queue_name = select_queue()
+        tier = tier_for_queue(queue_name)
+        upload_path = shard_path(
+            os.path.join(current_app.instance_path, "uploads"), tier, unique_filename
+        )
 
-        # LOGIKA PRIORYTETÓW
-        if g.user:
-            queue_name = "high_priority"
-            print(f"--> [FLASK] Użytkownik {g.user['username']} (VIP) -> High Priority")
-        else:
-            queue_name = "low_priority"
-            print("--> [FLASK] Użytkownik anonimowy -> Low Priority")
+        os.makedirs(os.path.dirname(upload_path), exist_ok=True)
+        file.save(upload_path)
 
-        task = process_image.apply_async(
-            args=[unique_filename, current_app.instance_path], queue=queue_name
-        )
+        task = enqueue(unique_filename, upload_path, queue_name, tier, operation)
 
         return (
             jsonify(
@@ -67,29 +94,278 @@ def upload_file():
     return jsonify({"error": "Invalid file type"}), 400
 
 
+@bp.route("/edit", methods=["POST"])
+@login_required
+def edit_image():
+    """
+    Re-blur a previous result of the logged-in user with a changed operation.
+
+    The body is ``{"base": "<result filename>", "operation": {...}}``. When
+    only the regions changed, the worker patches the previous result in the
+    changed rectangles instead of blurring the source from scratch.
+    """
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or not isinstance(data.get("base"), str):
+        return jsonify({"error": "Missing base result"}), 400
+
+    try:
+        operation = parse_operation(data.get("operation"))
+    except OperationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Tylko własne wyniki - edycja cudzego mogłaby przywrócić zamaskowane obszary
+    # ze źródła (np. twarze); zadania anonimowe nie mają właściciela
+    job = find_job_by_output(data["base"], g.user["id"])
+    if job is None:
+        return jsonify({"error": "Unknown base result"}), 404
+
+    # Źródło i poprzedni wynik żyją tyle, ile pozwala retencja tieru
+    tier = job["tier"]
+    upload_path = shard_path(
+        os.path.join(current_app.instance_path, "uploads"), tier, job["filename"]
+    )
+    previous_path = shard_path(
+        os.path.join(current_app.instance_path, "processed"), tier, data["base"]
+    )
+    if not (os.path.exists(upload_path) and os.path.exists(previous_path)):
+        return jsonify({"error": "Base result has expired"}), 410
+
+    previous = json.loads(job["operation"]) if job["operation"] else DEFAULT_OPERATION
+    changed = changed_regions(previous, operation)
+    if not can_patch(job["filename"], data["base"]):
+        changed = None
+    base = None if changed is None else {"filename": data["base"], "changed": changed}
+
+    queue_name = select_queue()
+    task = enqueue(job["filename"], upload_path, queue_name, tier, operation, base)
+
+    return (
+        jsonify(
+            {
+                "task_id": task.id,
+                "queue": queue_name,
+                "filename": job["filename"],
+                "delta": base is not None,
+            }
+        ),
+        202,
+    )
+
+
+def select_queue():
+    # LOGIKA PRIORYTETÓW
+    if g.user:
+        logger.debug("Użytkownik %s (VIP) -> High Priority", g.user["username"])
+        return "high_priority"
+
+    logger.debug("Użytkownik anonimowy -> Low Priority")
+    return "low_priority"
+
+
+def enqueue(filename, upload_path, queue_name, tier, operation, base=None):
+    # Wiersz zadania musi istnieć zanim worker zacznie je aktualizować
+    task_id = str(uuid.uuid4())
+    create_job(
+        task_id,
+        g.user["id"] if g.user else None,
+        filename,
+        file_digest(upload_path),
+        queue_name,
+        tier,
+        os.path.getsize(upload_path),
+        operation,
+    )
+
+    try:
+        return publish_task(
+            process_image,
+            [filename, current_app.instance_path, tier, operation, base],
+            queue_name,
+            task_id,
+        )
+    except TimeoutError:
+        # Brak potwierdzenia nie znaczy, że broker nie ma wiadomości - worker może
+        # jeszcze wykonać zadanie, więc wiersz zostaje (jego sygnały go uzupełnią)
+        set_job_status(task_id, "UNKNOWN")
+        raise
+    except Exception:
+        delete_job(task_id)
+        raise
+
+
+@bp.route("/jobs")
+@login_required
+def jobs():
+    """Processing history of the logged-in user, newest first."""
+    cursor = request.args.get("before")
+    limit = min(request.args.get("limit", 50, type=int), 100)
+
+    rows, next_cursor = get_jobs(
+        g.user["id"],
+        None if cursor is None else parse_cursor(cursor),
+        request.args.get("hash"),
+        max(limit, 1),
+    )
+
+    return jsonify(
+        {"jobs": [describe_job(row) for row in rows], "next_cursor": next_cursor}
+    )
+
+
+def describe_job(row):
+    job = {
+        key: row[key]
+        for key in (
+            "task_id",
+            "content_hash",
+            "queue",
+            "status",
+            "input_bytes",
+            "output_bytes",
+        )
+    }
+
+    for key in ("enqueued", "started", "finished"):
+        job[key] = row[key].isoformat() if row[key] else None
+
+    # Czas oczekiwania w kolejce i czas przetwarzania - historia do planowania mocy
+    if row["started"]:
+        job["wait_ms"] = (row["started"] - row["enqueued"]).total_seconds() * 1000
+    if row["started"] and row["finished"]:
+        job["process_ms"] = (row["finished"] - row["started"]).total_seconds() * 1000
+    if row["output_filename"]:
+        job["image_url"] = url_for("image.get_image", filename=row["output_filename"])
+
+    return job
+
+
 @bp.route("/status/<task_id>")
 def task_status(task_id):
-    celery_app = current_app.extensions["celery"]  # Pobieramy obiekt z __init__.py
-    task_result = celery_app.AsyncResult(task_id)  # Używamy go do sprawdzenia statusu
+    meta = read_states([task_id])[task_id]
+
+    # Polling co sekundę - logujemy tylko próbkę zapytań
+    log_sampled(
+        status_logger,
+        current_app.config["STATUS_LOG_SAMPLE_RATE"],
+        "Status %s: %s",
+        task_id,
+        meta["status"],
+    )
+
+    return jsonify(describe_task(task_id, meta))
+
+
+@bp.route("/status", methods=["POST"])
+def bulk_status():
+    """
+    States of many tasks in one request.
+
+    Body: ``{"task_ids": [...], "wait": "any" | "all", "timeout": seconds}``.
+    With ``wait`` the request blocks (up to ``STATUS_MAX_WAIT`` seconds)
+    until any or all of the tasks have finished. When ``STATUS_MAX_WAITERS``
+    requests of this process are already waiting, the current states are
+    returned at once and the client simply polls again.
+    """
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+
+    task_ids = data.get("task_ids")
+    wait = data.get("wait")
+
+    if not isinstance(task_ids, list) or not all(
+        isinstance(task_id, str) for task_id in task_ids
+    ):
+        return jsonify({"error": "task_ids must be a list of strings"}), 400
+    if len(task_ids) > current_app.config["STATUS_MAX_TASKS"]:
+        return jsonify({"error": "Too many task_ids"}), 400
+    if wait not in (None, "any", "all"):
+        return jsonify({"error": "wait must be 'any' or 'all'"}), 400
 
-    print(f"[STATUS] Sprawdzam ID={task_id}, Status={task_result.status}")
+    try:
+        timeout = float(data.get("timeout", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "timeout must be a number"}), 400
 
-    response = {"task_id": task_id, "status": task_result.status}
+    task_ids = list(dict.fromkeys(task_ids))
+    timeout = min(max(timeout, 0), current_app.config["STATUS_MAX_WAIT"])
+    slots = wait_slots()
+    # Wszystkie miejsca zajęte - bez czekania, żeby nie zablokować wątków workera
+    waiting = bool(wait and timeout) and slots.acquire(blocking=False)
 
-    if task_result.status == "SUCCESS":
-        response["result"] = task_result.result
+    try:
+        metas = wait_for_states(task_ids, wait if waiting else None, timeout)
+    finally:
+        if waiting:
+            slots.release()
+
+    return jsonify(
+        {"tasks": [describe_task(task_id, metas[task_id]) for task_id in task_ids]}
+    )
+
+
+def describe_task(task_id, meta):
+    # Dla stanów nieterminalnych odpowiedź to tylko stan - bez dekodowania wyniku
+    response = {"task_id": task_id, "status": meta["status"]}
+
+    if meta["status"] == "SUCCESS":
+        result = unpack_result(meta["result"])
+        response["result"] = result
         # Pobieramy nazwę pliku z wyniku workera
-        filename = task_result.result.get("filename")
+        filename = result.get("filename")
         if filename:
             response["image_url"] = url_for("image.get_image", filename=filename)
-    elif task_result.status == "FAILURE":
-        response["error"] = str(task_result.result)
+    elif meta["status"] == "FAILURE":
+        response["error"] = str(meta["result"])
 
-    return jsonify(response)
+    return response
 
 
 @bp.route("/result/<filename>")
 def get_image(filename):
-    return send_from_directory(
-        os.path.join(current_app.instance_path, "processed"), filename
-    )
+    """
+    Serve a processed image. Output names are content hashes, so the file
+    behind a URL never changes and can be cached forever by clients.
+    """
+    etag = filename.rsplit(".", 1)[0]
+
+    # Klient ma już ten obiekt - nie dotykamy dysku
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        return _immutable(response, etag)
+
+    processed_folder = os.path.join(current_app.instance_path, "processed")
+    path = find_file(processed_folder, filename)
+
+    if path is None:
+        abort(404)
+
+    accel_prefix = current_app.config["RESULT_ACCEL_REDIRECT"]
+    if accel_prefix:
+        # nginx serwuje bajty sam, worker Pythona tylko wskazuje plik
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0]
+        )
+        response.headers["X-Accel-Redirect"] = accel_prefix + os.path.relpath(
+            path, processed_folder
+        ).replace(os.sep, "/")
+    else:
+        # USE_X_SENDFILE=True przełącza send_file na nagłówek X-Sendfile
+        response = send_file(
+            path,
+            etag=etag,
+            conditional=True,
+            max_age=current_app.config["RESULT_MAX_AGE"],
+        )
+
+    return _immutable(response, etag)
+
+
+def _immutable(response, etag):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["RESULT_MAX_AGE"]
+    response.cache_control.immutable = True
+    return response
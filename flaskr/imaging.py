@@ -0,0 +1,302 @@
+"""Image engine used by the worker: decode, blur, encode."""
+
+import time
+
+from celery.signals import worker_process_init
+from PIL import Image, ImageFilter, ImageSequence
+
+
+def configure_arena(blocks_max, block_size=None):
+    """
+    Make Pillow keep freed image buffers for reuse.
+
+    Decoded and blurred images are allocated from Pillow's block arena.
+    With ``blocks_max`` > 0, blocks released by one task are kept and
+    recycled by the next one of a similar size instead of going back to the
+    system allocator, so a long-lived worker stops fragmenting its heap.
+    """
+    # Tryb "block allocator" (jeden malloc na obraz) omija arenę - wyłączamy go
+    Image.core.set_use_block_allocator(0)
+    if block_size is not None:
+        Image.core.set_block_size(block_size)
+    Image.core.set_blocks_max(blocks_max)
+
+
+def arena_stats():
+    return Image.core.get_stats()
+
+
+def decode(path):
+    """Open and fully decode an image, so decode cost is measured here."""
+    img = Image.open(path)
+    img.load()
+    return img
+
+
+def _pixelate(img, radius):
+    # Siatka komórek zaczyna się w (0, 0) obrazu - wycinki obszarów są do niej
+    # wyrównane (region_box), więc ten sam piksel zawsze trafia do tej samej komórki
+    with img.reduce(radius) as small:
+        size = (small.width * radius, small.height * radius)
+        with small.resize(size, Image.Resampling.NEAREST) as big:
+            return big.crop((0, 0, img.width, img.height))
+
+
+FILTERS = {
+    "gaussian": lambda img, r: img.filter(ImageFilter.GaussianBlur(r)),
+    "box": lambda img, r: img.filter(ImageFilter.BoxBlur(r)),
+    # Rozmycie ruchu = rozmycie pudełkowe tylko w poziomie
+    "motion": lambda img, r: img.filter(ImageFilter.BoxBlur((r, 0))),
+    "pixelate": _pixelate,
+}
+
+
+def halo(kind, radius):
+    """How far outside a region the filter reads pixels."""
+    if kind == "pixelate":
+        return 0
+    # Gauss w Pillow jest aproksymowany rozmyciem pudełkowym o zasięgu ~3 sigma
+    return 3 * radius if kind == "gaussian" else radius
+
+
+def _clip(rect, size):
+    x0, y0, x1, y1 = rect
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, size[0]), min(y1, size[1])
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+
+def region_box(kind, radius, rect, size):
+    """The part of the image that has to be filtered to blur ``rect``."""
+    x0, y0, x1, y1 = rect
+
+    if kind == "pixelate":
+        # Wyrównanie do siatki komórek całego obrazu
+        return _clip(
+            (
+                x0 // radius * radius,
+                y0 // radius * radius,
+                -(-x1 // radius) * radius,
+                -(-y1 // radius) * radius,
+            ),
+            size,
+        )
+
+    margin = halo(kind, radius)
+    return _clip((x0 - margin, y0 - margin, x1 + margin, y1 + margin), size)
+
+
+def _blur_region(source, out, kind, radius, rect):
+    box = region_box(kind, radius, rect, source.size)
+    with source.crop(box) as patch, FILTERS[kind](patch, radius) as blurred:
+        x0, y0, x1, y1 = rect
+        inner = (x0 - box[0], y0 - box[1], x1 - box[0], y1 - box[1])
+        out.paste(blurred.crop(inner), (x0, y0))
+
+
+# Tryby obsługiwane przez filtry; inne (paleta, 1, F, I;16, YCbCr...) -> RGB(A)
+FILTER_MODES = ("L", "LA", "RGB", "RGBA", "CMYK")
+
+
+def _filterable(img):
+    if img.mode not in FILTER_MODES:
+        return img.convert("RGBA" if has_alpha(img) else "RGB")
+    return img
+
+
+def blur(img, radius=10, kind="gaussian", regions=()):
+    """
+    Apply the blur operation to the whole image or only to ``regions``.
+
+    For regions, each rectangle plus a halo of context pixels is cropped,
+    filtered and pasted back, so the cost follows the masked area rather
+    than the image size.
+    """
+    img = _filterable(img)
+
+    if not regions:
+        return FILTERS[kind](img, radius)
+
+    out = img.copy()
+
+    for rect in regions:
+        rect = _clip(rect, img.size)
+        if rect is not None:
+            _blur_region(img, out, kind, radius, rect)
+
+    return out
+
+
+def reblur(source, previous, changed, radius=10, kind="gaussian", regions=()):
+    """
+    Turn ``previous`` into ``blur(source, radius, kind, regions)``.
+
+    ``previous`` is an earlier result of the same filter on ``source`` with
+    other regions. Only the ``changed`` rectangles are touched: they are
+    restored from ``source`` and the new regions overlapping them are blurred
+    again, so the cost follows the size of the edit.
+    """
+    source = _filterable(source)
+
+    if previous.size != source.size:
+        raise ValueError("Previous result does not match the source size.")
+
+    out = previous.convert(source.mode)
+
+    for rect in changed:
+        rect = _clip(rect, source.size)
+        if rect is None:
+            continue
+
+        with source.crop(rect) as original:
+            out.paste(original, rect[:2])
+
+        for region in regions:
+            overlap = _clip(
+                (
+                    max(rect[0], region[0]),
+                    max(rect[1], region[1]),
+                    min(rect[2], region[2]),
+                    min(rect[3], region[3]),
+                ),
+                source.size,
+            )
+            if overlap is not None:
+                _blur_region(source, out, kind, radius, overlap)
+
+    return out
+
+
+def is_animated(img):
+    return getattr(img, "n_frames", 1) > 1
+
+
+def has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def blur_frames(img, **operation):
+    """Blur every frame of an animation; return the frames and their durations."""
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(img):
+        durations.append(frame.info.get("duration", 100))
+        with frame.convert("RGBA") as rgba:
+            frames.append(blur(rgba, **operation))
+    return frames, durations
+
+
+# Rozszerzenie pliku wyniku dla formatu zapisu
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png", "GIF": "gif"}
+# Formaty źródeł bez strat kompresji (WEBP bywa jednym i drugim)
+LOSSLESS_FORMATS = ("PNG", "GIF", "BMP", "TIFF")
+
+
+def is_graphic(img, max_colors):
+    """
+    Whether ``img`` looks like a screenshot, logo or diagram, not a photo.
+
+    Palette images and images with at most ``max_colors`` distinct colours
+    have flat areas and sharp edges (text) that lossy codecs smear.
+    """
+    if img.mode in ("1", "P"):
+        return True
+
+    # Próbkowanie NEAREST nie tworzy nowych kolorów, a ogranicza koszt
+    # liczenia na dużych obrazach
+    if img.width * img.height > 512 * 512:
+        with img.resize((512, 512), Image.Resampling.NEAREST) as sample:
+            return sample.getcolors(max_colors) is not None
+    return img.getcolors(max_colors) is not None
+
+
+def choose_format(img, encoder, regions=()):
+    """
+    Pick the output format for the source ``img`` blurred with ``regions``.
+
+    A blurred photo is written with lossy ``encoder["format"]`` (WEBP or
+    JPEG), many times smaller than PNG and faster to write. Palette and
+    low-colour graphics use ``encoder["lossless"]`` so text is not damaged,
+    and so do region-only blurs of lossless sources, whose sharp pixels
+    would otherwise lose quality. Images with transparency never go to
+    JPEG, animations use ``encoder["animated"]``, and ``"keep"`` writes the
+    source format.
+    """
+    if is_animated(img):
+        return encoder["animated"]
+
+    format = encoder["format"]
+    if format == "keep":
+        return img.format
+    if is_graphic(img, encoder["max_colors"]):
+        return encoder["lossless"]
+    # Źródło JPEG jest już stratne - PNG z ostrą resztą byłby kilka razy większy
+    if regions and img.format in LOSSLESS_FORMATS:
+        return encoder["lossless"]
+    if format == "JPEG" and has_alpha(img):
+        return "WEBP"
+    return format
+
+
+def save_options(format, encoder):
+    if format == "WEBP":
+        return {"quality": encoder["quality"], "method": encoder["webp_method"]}
+    if format == "JPEG":
+        return {
+            "quality": encoder["quality"],
+            "optimize": True,
+            "progressive": encoder["jpeg_progressive"],
+        }
+    if format == "PNG":
+        return {"compress_level": encoder["png_compress_level"]}
+    return {}
+
+
+# Tryby zapisywane wprost; inne (np. CMYK z JPEG do PNG) -> RGB albo RGBA
+SAVE_MODES = {
+    "JPEG": ("L", "RGB"),
+    "PNG": ("1", "L", "LA", "P", "RGB", "RGBA"),
+    "WEBP": ("RGB", "RGBA"),
+}
+
+
+def encode(img, path, format, encoder=None, frames=(), durations=None):
+    """Save ``img``, followed by the animation ``frames`` if any, as ``format``."""
+    options = save_options(format, encoder) if encoder else {}
+
+    modes = SAVE_MODES.get(format)
+    if modes is not None and img.mode not in modes:
+        # JPEG nie ma kanału alfa - przezroczystość i tak przepada
+        alpha = format != "JPEG" and has_alpha(img)
+        img = img.convert("RGBA" if alpha else "RGB")
+
+    if frames:
+        options.update(
+            save_all=True, append_images=list(frames), duration=durations, loop=0
+        )
+
+    img.save(path, format=format, **options)
+
+
+class Timer:
+    """Collect named durations in milliseconds for the task result."""
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def restart(self):
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.timings[name] = round((now - self._last) * 1000, 2)
+        self._last = now
+
+
+def init_worker(app):
+    """Configure the buffer arena in every worker child process."""
+    arena = app.config["IMAGE_ARENA"]
+
+    @worker_process_init.connect(weak=False)
+    def on_worker_process_init(**kwargs):
+        configure_arena(**arena)
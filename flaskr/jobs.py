@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+
+from flaskr.db import connect, get_db
+from flaskr.forking import per_process
+from flaskr.results import unpack_result
+
+# Jeden rejestrator na proces workera (klucz "recorder")
+_recorders = {}
+
+
+def utcnow():
+    # Ten sam format co CURRENT_TIMESTAMP w SQLite, ale z mikrosekundami
+    return str(datetime.now(timezone.utc).replace(tzinfo=None))
+
+
+def create_job(
+    task_id, user_id, filename, content_hash, queue, tier, input_bytes, operation=None
+):
+    """Insert the job row of an upload before its task is published."""
+    db = get_db()
+    db.execute(
+        "INSERT INTO job (task_id, user_id, filename, content_hash, queue, tier,"
+        " input_bytes, operation, enqueued) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            task_id,
+            user_id,
+            filename,
+            content_hash,
+            queue,
+            tier,
+            input_bytes,
+            None if operation is None else json.dumps(operation),
+            utcnow(),
+        ),
+    )
+    db.commit()
+
+
+def find_job_by_output(output_filename, user_id):
+    """Return the latest successful job of a user that produced ``output_filename``."""
+    return (
+        get_db()
+        .execute(
+            "SELECT * FROM job WHERE output_filename = ? AND user_id = ?"
+            " AND status = 'SUCCESS' ORDER BY id DESC LIMIT 1",
+            (output_filename, user_id),
+        )
+        .fetchone()
+    )
+
+
+def delete_job(task_id):
+    db = get_db()
+    db.execute("DELETE FROM job WHERE task_id = ?", (task_id,))
+    db.commit()
+
+
+def set_job_status(task_id, status):
+    """Set the status of a job the worker has not picked up yet."""
+    db = get_db()
+    # Worker mógł już zapisać STARTED/SUCCESS - tego nie nadpisujemy
+    db.execute(
+        "UPDATE job SET status = ? WHERE task_id = ? AND status = 'PENDING'",
+        (status, task_id),
+    )
+    db.commit()
+
+
+def unfinished_filenames():
+    """Return the uploads still needed by queued or running jobs."""
+    rows = get_db().execute("SELECT DISTINCT filename FROM job WHERE finished IS NULL")
+    return {row[0] for row in rows}
+
+
+def get_jobs(user_id, before=None, content_hash=None, limit=50):
+    """
+    Return one page of a user's jobs, newest first, and the next cursor.
+
+    Pages are keyed by ``(enqueued, id)`` like the review feed and read the
+    ``job_user_enqueued`` index.
+    """
+    query = "SELECT * FROM job WHERE user_id = ?"
+    params = (user_id,)
+
+    if content_hash is not None:
+        query += " AND content_hash = ?"
+        params += (content_hash,)
+
+    if before is not None:
+        query += " AND (enqueued, id) < (?, ?)"
+        params += before
+
+    query += " ORDER BY enqueued DESC, id DESC LIMIT ?"
+    jobs = get_db().execute(query, params + (limit + 1,)).fetchall()
+
+    next_cursor = None
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        next_cursor = f"{jobs[-1]['enqueued']}_{jobs[-1]['id']}"
+
+    return jobs, next_cursor
+
+
+class JobRecorder:
+    """
+    Buffer job state changes in a worker process and write them in batches.
+
+    Updates are flushed in one transaction when ``batch_size`` is reached,
+    every ``flush_interval`` seconds from a background thread, and when the
+    worker process shuts down.
+    """
+
+    def __init__(self, database, flush_interval=1.0, batch_size=50):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._started = []
+        self._finished = []
+        self._stop = threading.Event()
+        thread = threading.Thread(target=self._run, name="job-recorder")
+        thread.daemon = True
+        thread.start()
+
+    def started(self, task_id):
+        self._add(self._started, (utcnow(), task_id))
+
+    def finished(self, task_id, status, output_filename=None, output_bytes=None):
+        self._add(
+            self._finished,
+            (utcnow(), status, output_filename, output_bytes, task_id),
+        )
+
+    def _add(self, buffer, row):
+        with self._lock:
+            buffer.append(row)
+            full = len(self._started) + len(self._finished) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            started, self._started = self._started, []
+            finished, self._finished = self._finished, []
+
+        if not started and not finished:
+            return
+
+        db = connect(self.database)
+        try:
+            with db:
+                db.executemany(
+                    "UPDATE job SET started = ?, status = 'STARTED'"
+                    " WHERE task_id = ? AND finished IS NULL",
+                    started,
+                )
+                db.executemany(
+                    "UPDATE job SET finished = ?, status = ?, output_filename = ?,"
+                    " output_bytes = ? WHERE task_id = ?",
+                    finished,
+                )
+        finally:
+            db.close()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+def get_recorder(database):
+    # Pula prefork: każdy proces potomny ma własny bufor i wątek
+    return per_process(_recorders, "recorder", lambda: JobRecorder(database))
+
+
+def init_worker(app, task_name="flaskr.tasks.process_image"):
+    """Record start and finish of ``task_name`` in the job table."""
+    database = app.config["DATABASE"]
+
+    @task_prerun.connect(weak=False)
+    def on_task_prerun(sender=None, task_id=None, **kwargs):
+        if sender.name == task_name:
+            get_recorder(database).started(task_id)
+
+    @task_postrun.connect(weak=False)
+    def on_task_postrun(sender=None, task_id=None, retval=None, state=None, **kwargs):
+        if sender.name != task_name:
+            return
+        if state == "SUCCESS":
+            result = unpack_result(retval)
+            get_recorder(database).finished(
+                task_id, state, result["filename"], result.get("bytes")
+            )
+        else:
+            get_recorder(database).finished(task_id, state)
+
+    @worker_process_shutdown.connect(weak=False)
+    @worker_shutdown.connect(weak=False)
+    def on_worker_shutdown(**kwargs):
+        recorder = _recorders.get("recorder")
+        if recorder is not None and recorder.pid == os.getpid():
+            recorder.close()
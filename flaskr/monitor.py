@@ -0,0 +1,250 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+
+from flask import current_app
+
+from flaskr.forking import per_process
+
+OK = "ok"
+DEGRADED = "degraded"
+ERROR = "error"
+STALE = "stale"
+UNKNOWN = "unknown"
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def check_broker(celery_app, timeout):
+    start = time.perf_counter()
+    with celery_app.connection_for_read(connect_timeout=timeout) as connection:
+        connection.ensure_connection(max_retries=1)
+    return {"status": OK, "latency_ms": _elapsed_ms(start)}
+
+
+def check_queues(celery_app, timeout, queue_max):
+    """Compare the depth of each queue with its limit (passive declare)."""
+    queues = {}
+    with celery_app.connection_for_read(connect_timeout=timeout) as connection:
+        channel = connection.default_channel
+        for name, limit in queue_max.items():
+            _, messages, consumers = channel.queue_declare(name, passive=True)
+            queues[name] = {"messages": messages, "consumers": consumers}
+            if messages > limit:
+                queues[name]["status"] = ERROR
+
+    status = ERROR if any("status" in q for q in queues.values()) else OK
+    return {"status": status, "queues": queues}
+
+
+def check_workers(celery_app, timeout, min_workers):
+    """Count the workers answering a broadcast ping."""
+    replies = celery_app.control.ping(timeout=timeout)
+    workers = sorted(name for reply in replies for name in reply)
+    return {"status": OK if len(workers) >= min_workers else ERROR, "workers": workers}
+
+
+def check_disk(paths, min_free_bytes):
+    disks = {}
+    for path in paths:
+        free = shutil.disk_usage(path).free
+        disks[path] = {"free_bytes": free}
+        if free < min_free_bytes:
+            disks[path]["status"] = ERROR
+
+    status = ERROR if any("status" in d for d in disks.values()) else OK
+    return {"status": status, "disks": disks}
+
+
+def check_results(backend, slow_ms):
+    """Time a write, read and delete of a probe key in the result store."""
+    key = backend.get_key_for_task(f"health-{socket.gethostname()}-{os.getpid()}")
+    start = time.perf_counter()
+    backend.set(key, b"ok")
+    if backend.get(key) != b"ok":
+        return {"status": ERROR, "error": "probe value mismatch"}
+    backend.delete(key)
+    latency_ms = _elapsed_ms(start)
+    return {
+        "status": DEGRADED if latency_ms > slow_ms else OK,
+        "latency_ms": latency_ms,
+    }
+
+
+class HealthMonitor:
+    """
+    Run dependency checks in a background thread and keep the latest results.
+
+    Probes read ``snapshot()`` and never wait on a dependency. A check that
+    has not finished within ``stale_after`` seconds is reported as stale.
+
+    With ``state_path``, the processes of one node (gunicorn workers) share
+    the work: the one holding a lock on ``<state_path>.lock`` runs the checks
+    and writes the results to ``state_path``, the others only read them. If
+    the checking process exits, its lock is released and another takes over.
+    """
+
+    def __init__(
+        self, checks, interval=15.0, stale_after=60.0, state_path=None, grace=0.0
+    ):
+        self.checks = checks
+        self.interval = interval
+        self.stale_after = stale_after
+        self.state_path = state_path
+        self.grace = grace
+        self.pid = os.getpid()
+        self.created = time.monotonic()
+        self._lock = threading.Lock()
+        self._results = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def start(self):
+        if self._thread is None:
+            # Wyniki innego procesu węzła są widoczne od razu, bez czekania
+            self.load()
+            self._thread = threading.Thread(target=self._run, name="health-monitor")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def starting(self):
+        """Whether the monitor is still within its startup grace period."""
+        return time.monotonic() - self.created < self.grace
+
+    def _run(self):
+        while True:
+            if self.is_leader():
+                self.run_checks()
+                self.save()
+            else:
+                self.load()
+            if self._stop.wait(self.interval):
+                return
+
+    def is_leader(self):
+        if self.state_path is None or self._lock_file is not None:
+            return True
+
+        lock_file = open(f"{self.state_path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        # Blokada trwa tak długo, jak otwarty plik - czyli do końca procesu
+        self._lock_file = lock_file
+        return True
+
+    def run_checks(self):
+        for name, check in self.checks.items():
+            try:
+                result = check()
+            except Exception as e:
+                result = {"status": ERROR, "error": str(e)}
+            result["checked"] = time.time()
+            with self._lock:
+                self._results[name] = result
+
+    def save(self):
+        if self.state_path is None:
+            return
+
+        with self._lock:
+            data = json.dumps(self._results)
+
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.state_path)
+
+    def load(self):
+        if self.state_path is None:
+            return
+
+        try:
+            with open(self.state_path) as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            self._results = results
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+
+        for name in self.checks:
+            result = results.setdefault(name, {"status": UNKNOWN})
+            if "checked" in result:
+                result["age_s"] = round(now - result.pop("checked"), 1)
+                if result["age_s"] > self.stale_after:
+                    result["status"] = STALE
+
+        return results
+
+
+def state_path(app):
+    """Node-local file with the shared check results of ``app``."""
+    config = app.config["HEALTH"]
+    if config["state_dir"] is None:
+        return None
+
+    key = hashlib.blake2b(app.instance_path.encode(), digest_size=4).hexdigest()
+    return os.path.join(config["state_dir"], f"flaskr-health-{key}.json")
+
+
+def create_monitor(app):
+    config = app.config["HEALTH"]
+    celery_app = app.extensions["celery"]
+    timeout = config["timeout"]
+    paths = [app.instance_path]
+    # Backend plikowy trzyma wyniki na /shared - tam też musi być miejsce
+    if getattr(celery_app.backend, "path", None):
+        paths.append(celery_app.backend.path)
+
+    checks = {
+        "broker": lambda: check_broker(celery_app, timeout),
+        "queues": lambda: check_queues(celery_app, timeout, config["queue_max"]),
+        "workers": lambda: check_workers(celery_app, timeout, config["min_workers"]),
+        "disk": lambda: check_disk(paths, config["min_free_bytes"]),
+        "results": lambda: check_results(celery_app.backend, config["result_slow_ms"]),
+    }
+    return HealthMonitor(
+        checks,
+        config["interval"],
+        config["stale_after"],
+        state_path(app),
+        config["startup_grace"],
+    )
+
+
+def get_monitor(app=None):
+    """
+    Return the running health monitor of the app, one per process.
+
+    Only one process of the node actually runs the checks (see
+    :class:`HealthMonitor`), so the probe load does not grow with the number
+    of gunicorn workers.
+    """
+    app = app or current_app._get_current_object()
+
+    # Po forku (gunicorn) wątek mastera nie istnieje - każdy proces ma własny,
+    # ale sprawdzenia wykonuje tylko jeden z nich
+    return per_process(
+        app.extensions, "health_monitor", lambda: create_monitor(app).start()
+    )
@@ -0,0 +1,106 @@
+"""Validation of the blur operation requested with an upload."""
+
+import json
+
+KINDS = ("gaussian", "box", "motion", "pixelate")
+MAX_RADIUS = 100
+MAX_REGIONS = 32
+
+DEFAULT_OPERATION = {"kind": "gaussian", "radius": 10, "regions": []}
+
+
+class OperationError(ValueError):
+    """The operation spec sent by the client is invalid."""
+
+
+def _parse_region(region):
+    if (
+        not isinstance(region, (list, tuple))
+        or len(region) != 4
+        or not all(isinstance(v, int) and not isinstance(v, bool) for v in region)
+    ):
+        raise OperationError("Each region must be [x0, y0, x1, y1] integers.")
+
+    x0, y0, x1, y1 = region
+    if x0 < 0 or y0 < 0 or x1 <= x0 or y1 <= y0:
+        raise OperationError(f"Invalid region {list(region)}.")
+
+    return [x0, y0, x1, y1]
+
+
+def parse_operation(raw):
+    """
+    Return a normalized operation dict from the ``operation`` form field.
+
+    ``raw`` is a JSON object such as
+    ``{"kind": "pixelate", "radius": 12, "regions": [[10, 10, 90, 40]]}``;
+    missing keys fall back to ``DEFAULT_OPERATION``. Regions limit the blur
+    to those rectangles (e.g. faces or plates) instead of the whole frame.
+    """
+    if not raw:
+        return dict(DEFAULT_OPERATION)
+
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        raise OperationError("Operation must be valid JSON.")
+
+    if not isinstance(data, dict):
+        raise OperationError("Operation must be a JSON object.")
+
+    unknown = set(data) - set(DEFAULT_OPERATION)
+    if unknown:
+        raise OperationError(f"Unknown operation keys: {', '.join(sorted(unknown))}.")
+
+    operation = {**DEFAULT_OPERATION, **data}
+
+    if operation["kind"] not in KINDS:
+        raise OperationError(f"Kind must be one of: {', '.join(KINDS)}.")
+
+    radius = operation["radius"]
+    if isinstance(radius, bool) or not isinstance(radius, int):
+        raise OperationError("Radius must be an integer.")
+    if not 1 <= radius <= MAX_RADIUS:
+        raise OperationError(f"Radius must be between 1 and {MAX_RADIUS}.")
+
+    regions = operation["regions"]
+    if not isinstance(regions, list) or len(regions) > MAX_REGIONS:
+        raise OperationError(f"Regions must be a list of at most {MAX_REGIONS}.")
+    operation["regions"] = [_parse_region(region) for region in regions]
+
+    return operation
+
+
+def changed_regions(previous, operation):
+    """
+    Return the rectangles in which ``operation`` differs from ``previous``.
+
+    ``None`` means the new result cannot be patched from the previous one:
+    the filter changed, or either operation blurs the whole frame.
+    """
+    for key in ("kind", "radius"):
+        if previous[key] != operation[key]:
+            return None
+
+    if not previous["regions"] or not operation["regions"]:
+        return None
+
+    old = {tuple(region) for region in previous["regions"]}
+    new = {tuple(region) for region in operation["regions"]}
+    # Dodane obszary trzeba rozmyć, usunięte - przywrócić ze źródła
+    return [list(region) for region in sorted(old ^ new)]
+
+
+# Łatać można tylko wyniki bezstratne - łatanie JPEG/WEBP oznaczałoby kolejną
+# generację kompresji stratnej w niezmienionych obszarach przy każdej edycji.
+# Bezstratnie (ENCODER["lossless"]) zapisywane są obszary rozmyte w źródłach
+# bezstratnych; edycje zdjęć JPEG idą jako pełne zadanie.
+PATCHABLE_EXTENSIONS = {"png"}
+
+
+def can_patch(source_filename, base_filename):
+    """Whether a delta job may patch ``base_filename`` made from ``source_filename``."""
+    # GIF może być animacją - worker przetwarza ją całą, klatka po klatce
+    if source_filename.rsplit(".", 1)[-1].lower() == "gif":
+        return False
+    return base_filename.rsplit(".", 1)[-1].lower() in PATCHABLE_EXTENSIONS
@@ -0,0 +1,216 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from flask import current_app
+
+from flaskr.forking import per_process
+
+
+class PublishMetrics:
+    """Rolling publish latency statistics for one process."""
+
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self._samples.append(seconds)
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, errors, total = self.count, self.errors, self.total
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+        return {
+            "count": count,
+            "errors": errors,
+            "avg_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": samples[-1] * 1000 if samples else 0.0,
+        }
+
+
+class _ConfirmBatcher:
+    """
+    Publish tasks from many request threads over one confirm-mode channel.
+
+    Requests queue up for at most ``window`` seconds (or ``size`` messages),
+    are published back to back, and the whole batch waits for the broker's
+    acks together instead of one round trip per message.
+    """
+
+    def __init__(self, celery_app, window, size, timeout):
+        self.celery_app = celery_app
+        self.window = window
+        self.size = size
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._connection = None
+        self._channel = None
+        self._producer = None
+        self._pending = {}
+        self._next_tag = 1
+        thread = threading.Thread(target=self._run, name="confirm-batcher")
+        thread.daemon = True
+        thread.start()
+
+    def submit(self, task, args, queue_name, task_id=None):
+        future = Future()
+        self._queue.put((task, args, queue_name, task_id, future))
+        return future.result(timeout=self.window + self.timeout + 1)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._publish_batch(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._reset()
+
+    def _ensure_channel(self):
+        if self._channel is None:
+            self._connection = self.celery_app.connection_for_write()
+            self._channel = self._connection.channel()
+            self._channel.confirm_select()
+            self._channel.events["basic_ack"].add(self._on_ack)
+            self._channel.events["basic_nack"].add(self._on_nack)
+            self._producer = self.celery_app.amqp.Producer(self._channel)
+            self._next_tag = 1
+        return self._producer
+
+    def _reset(self):
+        connection = self._connection
+        self._connection = self._channel = self._producer = None
+        self._pending.clear()
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _settle(self, delivery_tag, multiple, error=None):
+        tags = (
+            [tag for tag in self._pending if tag <= delivery_tag]
+            if multiple
+            else [delivery_tag]
+        )
+        for tag in tags:
+            future, result = self._pending.pop(tag, (None, None))
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _on_ack(self, delivery_tag, multiple):
+        self._settle(delivery_tag, multiple)
+
+    def _on_nack(self, delivery_tag, multiple):
+        self._settle(delivery_tag, multiple, RuntimeError("Broker rejected message"))
+
+    def _publish_batch(self, batch):
+        producer = self._ensure_channel()
+
+        for task, args, queue_name, task_id, future in batch:
+            result = task.apply_async(
+                args=args, queue=queue_name, task_id=task_id, producer=producer
+            )
+            self._pending[self._next_tag] = (future, result)
+            self._next_tag += 1
+
+        deadline = time.monotonic() + self.timeout
+        while self._pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out waiting for publisher confirms")
+            self._connection.drain_events(timeout=remaining)
+
+
+class Publisher:
+    """
+    Per-process task publisher.
+
+    By default every publish checks a producer out of Celery's connection
+    pool. With ``batch`` configured and an AMQP broker, publishes from
+    concurrent requests share a confirm-mode channel and batched acks.
+    """
+
+    def __init__(self, celery_app, batch=None):
+        self.celery_app = celery_app
+        self.pid = os.getpid()
+        self.metrics = PublishMetrics()
+        self._batcher = None
+
+        if batch and self._supports_confirms():
+            self._batcher = _ConfirmBatcher(
+                celery_app,
+                window=batch.get("window", 0.005),
+                size=batch.get("size", 64),
+                timeout=batch.get("timeout", 5.0),
+            )
+
+    def _supports_confirms(self):
+        with self.celery_app.connection_for_write() as connection:
+            return connection.transport.driver_type == "amqp"
+
+    def publish(self, task, args, queue, task_id=None):
+        start_time = time.perf_counter()
+        error = False
+        try:
+            if self._batcher is not None:
+                return self._batcher.submit(task, args, queue, task_id)
+            with self.celery_app.producer_pool.acquire(block=True) as producer:
+                return task.apply_async(
+                    args=args, queue=queue, task_id=task_id, producer=producer
+                )
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - start_time, error=error)
+
+
+def get_publisher():
+    """Return the publisher of the current app, created once per process."""
+    celery_app = current_app.extensions["celery"]
+    batch = current_app.config["BROKER_CONFIRM_BATCH"]
+
+    return per_process(
+        current_app.extensions, "publisher", lambda: Publisher(celery_app, batch)
+    )
+
+
+def publish_task(task, args, queue, task_id=None):
+    """Send ``task`` to ``queue`` through the per-process publisher."""
+    return get_publisher().publish(task, args, queue, task_id)
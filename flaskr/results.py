@@ -0,0 +1,25 @@
+# Wynik zadania process_image to krótka lista o stałym układzie pól zamiast
+# słownika z nazwami kluczy - serializowana msgpackiem zajmuje kilkadziesiąt bajtów.
+RESULT_FIELDS = (
+    "filename",
+    "bytes",
+    "width",
+    "height",
+    "decode_ms",
+    "blur_ms",
+    "encode_ms",
+    "format",
+)
+
+
+def pack_result(**fields):
+    """Return a task result as a positional list in ``RESULT_FIELDS`` order."""
+    return [fields.get(name) for name in RESULT_FIELDS]
+
+
+def unpack_result(value):
+    """Return a result produced by :func:`pack_result` as a dict."""
+    # Wyniki zapisane przed zmianą formatu są jeszcze słownikami
+    if isinstance(value, dict):
+        return value
+    return dict(zip(RESULT_FIELDS, value))
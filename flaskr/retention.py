@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import click
+from flask import current_app
+
+from flaskr.jobs import unfinished_filenames
+
+# Pliki trzymamy w układzie <folder>/<tier>/<2 znaki hasha>/<plik> zamiast
+# jednego płaskiego katalogu - listowanie i lookup nie rosną z liczbą plików.
+SHARD_COUNT = 256
+STORAGE_KINDS = ("uploads", "processed")
+TIERS = ("vip", "anon")
+QUEUE_TIERS = {"high_priority": "vip", "low_priority": "anon"}
+
+CURSOR_FILE = "retention.json"
+# Plik tymczasowy zadania żyje kilka-kilkanaście sekund; starszy to pozostałość
+# po zadaniu, które padło przed os.replace
+TMP_MAX_AGE = 60 * 60
+
+
+def tier_for_queue(queue_name):
+    return QUEUE_TIERS.get(queue_name, "anon")
+
+
+def shard_for(filename):
+    """Return the shard directory name (hex prefix) for a stored file."""
+    return filename[:2].lower()
+
+
+def shard_path(folder, tier, filename):
+    """Return the sharded location of ``filename`` inside ``folder``."""
+    return os.path.join(folder, tier, shard_for(filename), filename)
+
+
+def file_digest(path):
+    """Return the hex content hash used to name immutable output files."""
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16))
+    return digest.hexdigest()
+
+
+def find_file(folder, filename):
+    """Return the path of ``filename`` in any tier of ``folder`` or None."""
+    for tier in TIERS:
+        path = shard_path(folder, tier, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _read_state(instance_path):
+    try:
+        with open(os.path.join(instance_path, CURSOR_FILE)) as f:
+            state = json.load(f)
+        shard = int(state.get("shard", 0)) % SHARD_COUNT
+        usage = state.get("usage", {})
+    except (OSError, ValueError, AttributeError):
+        shard, usage = 0, {}
+    return shard, usage
+
+
+def _write_state(instance_path, shard, usage):
+    path = os.path.join(instance_path, CURSOR_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"shard": shard, "usage": usage}, f)
+    os.replace(tmp_path, path)
+
+
+def sweep_shard(directory, ttl, max_bytes, now, min_age=0, keep=()):
+    """
+    Remove expired files from one shard directory, then evict the oldest
+    files until the shard fits in ``max_bytes``.
+
+    Files younger than ``min_age`` seconds and names in ``keep`` (uploads
+    of unfinished jobs) are never evicted, only expired. ``stats["bytes"]``
+    is the size of the shard after the sweep.
+    """
+    stats = {"expired": 0, "evicted": 0, "freed": 0, "bytes": 0}
+
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return stats
+
+    kept = []
+    for entry in entries:
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        if not entry.is_file():
+            continue
+        if now - st.st_mtime > ttl:
+            os.unlink(entry.path)
+            stats["expired"] += 1
+            stats["freed"] += st.st_size
+        else:
+            stats["bytes"] += st.st_size
+            if entry.name not in keep:
+                kept.append((st.st_mtime, st.st_size, entry.path))
+
+    if max_bytes is not None:
+        for mtime, size, path in sorted(kept):
+            if stats["bytes"] <= max_bytes or now - mtime < min_age:
+                break
+            os.unlink(path)
+            stats["bytes"] -= size
+            stats["evicted"] += 1
+            stats["freed"] += size
+
+    return stats
+
+
+def sweep_tmp(directory, now, max_age=TMP_MAX_AGE):
+    """Remove temporary files of crashed tasks (``.<name>.tmp`` next to shards)."""
+    stats = {"expired": 0, "freed": 0}
+
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return stats
+
+    for entry in entries:
+        if not (entry.name.startswith(".") and entry.name.endswith(".tmp")):
+            continue
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.is_file() and now - st.st_mtime > max_age:
+            os.unlink(entry.path)
+            stats["expired"] += 1
+            stats["freed"] += st.st_size
+
+    return stats
+
+
+def sweep(instance_path, config, shards=None, now=None, keep=()):
+    """
+    Run one incremental retention pass.
+
+    Only ``shards`` shard directories (per kind and tier) are visited,
+    starting where the previous pass stopped. The size limit applies to the
+    whole tier: the size of every shard is remembered from its last visit,
+    and a visited shard gives up its oldest files while the tier total is
+    over the limit. ``keep`` are uploads that must not be evicted.
+    Returns counters and the shard the next pass will start from.
+    """
+    if now is None:
+        now = time.time()
+    if shards is None:
+        shards = config.get("shards_per_sweep", 32)
+    shards = max(1, min(shards, SHARD_COUNT))
+    min_age = config.get("min_age", 0)
+
+    start, usage = _read_state(instance_path)
+    stats = {"expired": 0, "evicted": 0, "freed": 0, "shards": shards}
+
+    for offset in range(shards):
+        shard = f"{(start + offset) % SHARD_COUNT:02x}"
+        for tier in TIERS:
+            max_bytes = config.get("max_bytes", {}).get(tier)
+            tier_usage = usage.setdefault(tier, {})
+            for kind in STORAGE_KINDS:
+                name = f"{kind}/{shard}"
+                tier_usage.pop(name, None)
+                # Shard może zająć tyle, ile zostawia reszta tieru (wg ostatnich
+                # odwiedzin pozostałych shardów)
+                if max_bytes is not None:
+                    limit = max_bytes - sum(tier_usage.values())
+                else:
+                    limit = None
+                shard_stats = sweep_shard(
+                    os.path.join(instance_path, kind, tier, shard),
+                    config["ttl"][tier],
+                    limit,
+                    now,
+                    min_age,
+                    keep if kind == "uploads" else (),
+                )
+                tier_usage[name] = shard_stats.pop("bytes")
+                for key, value in shard_stats.items():
+                    stats[key] += value
+
+    # Pliki tymczasowe leżą obok shardów, poza kursorem - ich jest niewiele
+    for tier in TIERS:
+        tmp_stats = sweep_tmp(os.path.join(instance_path, "processed", tier), now)
+        for key, value in tmp_stats.items():
+            stats[key] += value
+
+    next_shard = (start + shards) % SHARD_COUNT
+    _write_state(instance_path, next_shard, usage)
+    stats["next_shard"] = next_shard
+    # Pełny obieg zakończony - wtedy sprzątamy też płaski katalog wyników Celery
+    stats["wrapped"] = start + shards >= SHARD_COUNT
+
+    return stats
+
+
+def run_sweep(shards=None):
+    """Sweep storage of the current app, including expired Celery results."""
+    try:
+        keep = unfinished_filenames()
+    except sqlite3.OperationalError:
+        # Baza bez tabeli job (niezainicjalizowana) - nie ma czego chronić
+        keep = set()
+
+    stats = sweep(
+        current_app.instance_path,
+        current_app.config["RETENTION"],
+        shards=shards,
+        keep=keep,
+    )
+
+    if stats["wrapped"]:
+        current_app.extensions["celery"].backend.cleanup()
+
+    return stats
+
+
+@click.command("sweep-storage")
+@click.option("--shards", type=int, default=None, help="Shards to visit.")
+@click.option("--all", "full", is_flag=True, help="Visit every shard.")
+def sweep_storage_command(shards, full):
+    """Delete expired uploads, processed images and task results."""
+    stats = run_sweep(SHARD_COUNT if full else shards)
+    click.echo(
+        f"Swept {stats['shards']} shards: {stats['expired']} expired,"
+        f" {stats['evicted']} evicted, {stats['freed']} bytes freed."
+    )
+
+
+def init_app(app):
+    app.cli.add_command(sweep_storage_command)
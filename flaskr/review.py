@@ -1,21 +1,95 @@
-from flask import Blueprint, flash, g, redirect, render_template, request, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    g,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 from werkzeug.exceptions import abort
 
 from flaskr.auth import login_required
-from flaskr.db import get_db
+from flaskr.cache import get_cache
+from flaskr.db import get_db, parse_cursor
 
 bp = Blueprint("review", __name__)
 
 
-@bp.route("/")
-def index():
-    db = get_db()
-    posts = db.execute(
+def get_posts(before=None, limit=20):
+    """
+    Return one page of posts, newest first, and the cursor of the next page.
+
+    Pages are keyed by ``(created, id)`` of the last post shown, so each
+    page is a range scan of the ``post_created_id`` index.
+    """
+    query = (
         "SELECT p.id, title, body, created, author_id, username"
         " FROM post p JOIN user u ON p.author_id = u.id"
-        " ORDER BY created DESC"
-    ).fetchall()
-    return render_template("review/index.html", posts=posts)
+    )
+    params = ()
+
+    if before is not None:
+        query += " WHERE (p.created, p.id) < (?, ?)"
+        params = before
+
+    query += " ORDER BY p.created DESC, p.id DESC LIMIT ?"
+    posts = get_db().execute(query, params + (limit + 1,)).fetchall()
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        last = posts[-1]
+        next_cursor = f"{last['created']}_{last['id']}"
+
+    return posts, next_cursor
+
+
+def index_version():
+    return (
+        get_db()
+        .execute("SELECT version FROM cache_version WHERE name = 'index'")
+        .fetchone()[0]
+    )
+
+
+def invalidate_index(db):
+    """
+    Bump the front page version in the transaction that changed the posts.
+
+    The version is part of the cache key, so every process (gunicorn worker)
+    stops serving its cached copy as soon as the change is committed.
+    """
+    db.execute("UPDATE cache_version SET version = version + 1 WHERE name = 'index'")
+    get_cache("INDEX_CACHE").clear()
+
+
+@bp.route("/")
+def index():
+    cursor = request.args.get("before")
+    # Cache'ujemy tylko pierwszą stronę i tylko bez oczekujących komunikatów flash
+    cacheable = cursor is None and "_flashes" not in session
+    cache = get_cache("INDEX_CACHE")
+    # Lokalny TTLCache nie wie o zapisach w innych procesach - wersja z bazy wie
+    cache_key = (index_version(), g.user["id"] if g.user else None)
+
+    if cacheable:
+        page = cache.get(cache_key)
+        if page is not None:
+            return page
+
+    posts, next_cursor = get_posts(
+        None if cursor is None else parse_cursor(cursor),
+        current_app.config["POSTS_PER_PAGE"],
+    )
+    page = render_template("review/index.html", posts=posts, next_cursor=next_cursor)
+
+    if cacheable:
+        cache.set(cache_key, page)
+
+    return page
 
 
 @bp.route("/create", methods=("GET", "POST"))
@@ -37,6 +111,7 @@ def create():
                 "INSERT INTO post (title, body, author_id)" " VALUES (?, ?, ?)",
                 (title, body, g.user["id"]),
             )
+            invalidate_index(db)
             db.commit()
             return redirect(url_for("review.index"))
 
@@ -84,6 +159,7 @@ def update(id):
             db.execute(
                 "UPDATE post SET title = ?, body = ?" " WHERE id = ?", (title, body, id)
             )
+            invalidate_index(db)
             db.commit()
             return redirect(url_for("review.index"))
 
@@ -96,5 +172,6 @@ def delete(id):
     get_post(id)
     db = get_db()
     db.execute("DELETE FROM post WHERE id = ?", (id,))
+    invalidate_index(db)
     db.commit()
     return redirect(url_for("review.index"))
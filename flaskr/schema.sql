@@ -1,3 +1,8 @@
+-- Schemat bazowy; indeksy i późniejsze zmiany dokłada migrate_db() (db.MIGRATIONS)
+PRAGMA user_version = 0;
+
+DROP TABLE IF EXISTS job;
+
 DROP TABLE IF EXISTS user;
 
 DROP TABLE IF EXISTS post;
@@ -0,0 +1,96 @@
+import logging
+import random
+import threading
+import time
+
+from celery import states
+from flask import current_app
+
+from flaskr.cache import get_cache
+
+
+def log_sampled(logger, rate, msg, *args):
+    """Log ``msg`` at DEBUG level for roughly a ``rate`` fraction of calls."""
+    if rate > 0 and logger.isEnabledFor(logging.DEBUG) and random.random() < rate:
+        logger.debug(msg, *args)
+
+
+def read_states(task_ids):
+    """
+    Return ``{task_id: meta}`` for many tasks with one batched backend read.
+
+    Finished tasks never change again, so their metadata is kept in a
+    per-process cache and only unfinished tasks go to the backend.
+    """
+    backend = current_app.extensions["celery"].backend
+    cache = get_cache("RESULT_CACHE")
+    metas = {}
+    missing = []
+
+    for task_id in task_ids:
+        meta = cache.get(task_id)
+        if meta is None:
+            missing.append(task_id)
+        else:
+            metas[task_id] = meta
+
+    if not missing:
+        return metas
+
+    if hasattr(backend, "mget"):
+        # Backend klucz-wartość: jedno mget zamiast osobnego odczytu na zadanie
+        values = backend.mget([backend.get_key_for_task(t) for t in missing])
+        for task_id, value in zip(missing, values):
+            metas[task_id] = (
+                backend.decode_result(value)
+                if value
+                else {"status": states.PENDING, "result": None}
+            )
+    else:
+        for task_id in missing:
+            metas[task_id] = backend.get_task_meta(task_id)
+
+    for task_id in missing:
+        if metas[task_id]["status"] in states.READY_STATES:
+            cache.set(task_id, metas[task_id])
+
+    return metas
+
+
+def wait_slots():
+    """
+    Return the semaphore that bounds long-polling requests in this process.
+
+    Each waiting request holds a gunicorn thread; ``STATUS_MAX_WAITERS``
+    below the thread count leaves threads free for uploads.
+    """
+    slots = current_app.extensions.get("status_wait_slots")
+
+    if slots is None:
+        slots = current_app.extensions.setdefault(
+            "status_wait_slots",
+            threading.BoundedSemaphore(current_app.config["STATUS_MAX_WAITERS"]),
+        )
+
+    return slots
+
+
+def wait_for_states(task_ids, wait=None, timeout=0, interval=0.25):
+    """
+    Read the states of ``task_ids``, polling until ``wait`` is satisfied.
+
+    ``wait`` is ``"any"`` (at least one task finished) or ``"all"``. Polling
+    stops after ``timeout`` seconds and the latest states are returned.
+    """
+    metas = read_states(task_ids)
+    deadline = time.monotonic() + timeout
+    check = all if wait == "all" else any
+
+    # Pusta lista: any([]) jest fałszem - nie ma na co czekać
+    while wait and task_ids and time.monotonic() < deadline:
+        if check(meta["status"] in states.READY_STATES for meta in metas.values()):
+            break
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        metas = read_states(task_ids)
+
+    return metas
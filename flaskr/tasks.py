@@ -1,36 +1,113 @@
 import time
 import os
+import uuid
 from celery import shared_task
-from PIL import Image, ImageFilter
+from celery.utils.log import get_task_logger
+from flask import current_app
+
+from flaskr.operations import DEFAULT_OPERATION
+from flaskr.results import pack_result
+from flaskr.retention import file_digest, run_sweep, shard_path
+
+logger = get_task_logger(__name__)
 
 
 @shared_task(ignore_result=False)
-def process_image(filename, destination_folder):
+def process_image(filename, destination_folder, tier="anon", operation=None, base=None):
     """
     To zadanie wykonuje się w tle.
+
+    ``base`` (opcjonalnie) to zadanie przyrostowe: ``{"filename": poprzedni
+    wynik, "changed": zmienione prostokąty}`` - poprzedni wynik jest tylko
+    łatany w tych prostokątach zamiast rozmywania całego obrazu od nowa.
     """
-    input_path = os.path.join(destination_folder, "uploads", filename)
-    output_dir = os.path.join(destination_folder, "processed")
-    output_path = os.path.join(output_dir, filename)
+    # PIL (przez flaskr.imaging) ładujemy dopiero w workerze - proces web
+    # importuje ten moduł tylko po to, żeby wysłać zadanie
+    from flaskr import imaging
+
+    input_path = shard_path(os.path.join(destination_folder, "uploads"), tier, filename)
+    processed_folder = os.path.join(destination_folder, "processed")
+    # Plik tymczasowy leży poza shardami - nazwę docelową znamy dopiero po hashu.
+    # Unikalny na każde uruchomienie: dwie edycje tego samego źródła albo
+    # ponownie dostarczone zadanie nie mogą pisać do tego samego pliku
+    tmp_path = os.path.join(
+        processed_folder, tier, f".{filename}.{uuid.uuid4().hex}.tmp"
+    )
+
+    logger.info("Przetwarzanie obrazu: %s", filename)
+
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
 
-    print(f"--> [START] Przetwarzanie obrazu: {filename}")
+    timer = imaging.Timer()
 
-    os.makedirs(output_dir, exist_ok=True)
+    operation = operation or DEFAULT_OPERATION
+    encoder = current_app.config["ENCODER"]
+    frames, durations = [], None
 
     # 1. Otwarcie obrazu
-    with Image.open(input_path) as img:
-        # 2. Nakładanie filtra (Blur)
-        blurred_img = img.filter(ImageFilter.GaussianBlur(radius=10))
+    with imaging.decode(input_path) as img:
+        # 2. Nakładanie filtra (Blur) - rodzaj, promień i obszary z uploadu
+        if imaging.is_animated(img):
+            # Animacja: każda klatka osobno (zadanie przyrostowe dotyczy tylko
+            # pojedynczych obrazów - tu zawsze pełne przetwarzanie)
+            timer.lap("decode_ms")
+            frames, durations = imaging.blur_frames(img, **operation)
+            blurred_img = frames.pop(0)
+        elif base is None:
+            timer.lap("decode_ms")
+            blurred_img = imaging.blur(img, **operation)
+        else:
+            previous_path = shard_path(processed_folder, tier, base["filename"])
+            with imaging.decode(previous_path) as previous:
+                timer.lap("decode_ms")
+                blurred_img = imaging.reblur(
+                    img, previous, base["changed"], **operation
+                )
 
-        # 3. SZTUCZNE OPÓŹNIENIE (aby wykazać działanie kolejki)
-        print(f"--> [WAIT] Czekam 10 sekund dla: {filename}")
-        time.sleep(10)
+        # Format wyniku zależy od treści (grafika, przezroczystość, animacja)
+        # i od tego, czy rozmyto cały obraz - nie od formatu uploadu
+        output_format = imaging.choose_format(img, encoder, operation["regions"])
 
-        # 4. Zapis wyniku
-        blurred_img.save(output_path)
+        with blurred_img:
+            timer.lap("blur_ms")
 
-    print(f"--> [KONIEC] Obraz gotowy: {output_path}")
+            # 3. SZTUCZNE OPÓŹNIENIE (aby wykazać działanie kolejki)
+            logger.debug("Czekam 10 sekund dla: %s", filename)
+            time.sleep(10)
+
+            # 4. Zapis wyniku
+            timer.restart()
+            imaging.encode(
+                blurred_img, tmp_path, output_format, encoder, frames, durations
+            )
+            width, height = blurred_img.size
+    # Wyjście z "with" oddaje bufory obu obrazów do areny od razu, nie przy GC
+    for frame in frames:
+        frame.close()
+
+    # 5. Nazwa wyniku = hash zawartości (niezmienny obiekt, ETag dla HTTP)
+    ext = imaging.EXTENSIONS.get(output_format, output_format.lower())
+    output_filename = f"{file_digest(tmp_path)}.{ext}"
+    output_path = shard_path(processed_folder, tier, output_filename)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    os.replace(tmp_path, output_path)
+    timer.lap("encode_ms")
+
+    logger.info("Obraz gotowy: %s", output_path)
 
     # Zwracamy tylko dane sukcesu. W przypadku błędu, funkcja rzuci wyjątek
     # i ten return nigdy się nie wykona (co jest poprawne).
-    return {"filename": filename}
+    return pack_result(
+        filename=output_filename,
+        bytes=os.path.getsize(output_path),
+        width=width,
+        height=height,
+        format=output_format,
+        **timer.timings,
+    )
+
+
+@shared_task(ignore_result=True)
+def sweep_storage():
+    """Okresowe, przyrostowe sprzątanie plików (uruchamiane przez celery beat)."""
+    return run_sweep()
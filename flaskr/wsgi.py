@@ -0,0 +1,36 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py``."""
+
+from flaskr import create_app
+from flaskr.monitor import get_monitor
+
+
+def warm_up(app):
+    """Compile every template once, before the master forks its workers."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
+def init_worker(app):
+    """
+    Open the broker producer pool inside a freshly forked worker.
+
+    Connections inherited from the master must never be shared between
+    processes, so the pool is dropped and the first connection is made here
+    instead of on the first upload.
+    """
+    celery_app = app.extensions["celery"]
+    # To samo robi Celery po forku z multiprocessing - gunicorn forkuje sam
+    celery_app._after_fork()
+
+    try:
+        with celery_app.producer_pool.acquire(block=True) as producer:
+            producer.connection.ensure_connection(max_retries=1)
+    except Exception as e:
+        app.logger.warning("Broker connection not ready after fork: %s", e)
+
+    # Pierwsze sprawdzenia zależności startują od razu, nie przy pierwszym /readyz
+    get_monitor(app)
+
+
+app = create_app()
+warm_up(app)
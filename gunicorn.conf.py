@@ -0,0 +1,31 @@
+# Profil produkcyjny: pre-fork gunicorn zamiast serwera deweloperskiego Flaska.
+# Uruchomienie: gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+wsgi_app = "flaskr.wsgi:app"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Upload i polling statusu to głównie I/O (dysk, broker) - wątki w workerze
+# pozwalają obsłużyć więcej żądań bez mnożenia procesów. Czekające zapytania
+# o status (long-polling) zajmują najwyżej STATUS_MAX_WAITERS z nich.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Aplikacja (blueprinty, szablony) ładowana raz w masterze,
+# workery dziedziczą ją po forku
+preload_app = True
+
+keepalive = 5
+max_requests = 10000
+max_requests_jitter = 1000
+timeout = 30
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    from flaskr.wsgi import app, init_worker
+
+    init_worker(app)
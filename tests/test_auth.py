@@ -63,3 +63,36 @@ def test_logout(client, auth):
     with client:
         auth.logout()
         assert "user_id" not in session
+
+
+def test_user_cache(client, auth, app):
+    auth.login()
+
+    with client:
+        client.get("/")
+        assert g.user["username"] == "test"
+
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE user SET username = 'renamed' WHERE id = 1")
+        db.commit()
+
+    # served from the cache, no database lookup
+    with client:
+        client.get("/")
+        assert g.user["username"] == "test"
+
+    auth.logout()
+    auth.login("renamed", "test")
+
+    with client:
+        client.get("/")
+        assert g.user["username"] == "renamed"
+
+
+def test_health_skips_user_lookup(client, auth):
+    auth.login()
+
+    with client:
+        client.get("/healthz")
+        assert g.user is None
@@ -1,10 +1,14 @@
+import os
 import sqlite3
 
 import pytest
-from flaskr.db import get_db
+from flaskr import create_app
+from flaskr.db import MIGRATIONS, get_db, upgrade_db
 
 
 def test_get_close_db(app):
+    app.config["DATABASE_POOL"] = False
+
     with app.app_context():
         db = get_db()
         assert db is get_db()
@@ -15,6 +19,18 @@ def test_get_close_db(app):
     assert "closed" in str(e.value)
 
 
+def test_pooled_db(app):
+    with app.app_context():
+        db = get_db()
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        db.execute("DELETE FROM post")
+
+    # the connection is reused and the uncommitted change was rolled back
+    with app.app_context():
+        assert get_db() is db
+        assert db.execute("SELECT COUNT(*) FROM post").fetchone()[0] == 1
+
+
 def test_init_db_command(runner, monkeypatch):
     class Recorder(object):
         called = False
@@ -26,3 +42,27 @@ def test_init_db_command(runner, monkeypatch):
     result = runner.invoke(args=["init-db"])
     assert "Initialized" in result.output
     assert Recorder.called
+
+
+def test_upgrade_on_startup(app):
+    with app.app_context():
+        db = get_db()
+        db.executescript("DROP TABLE job; PRAGMA user_version = 1;")
+
+    create_app({"TESTING": True, "DATABASE": app.config["DATABASE"]})
+
+    with app.app_context():
+        db = get_db()
+        assert db.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        assert db.execute("SELECT COUNT(*) FROM job").fetchone()[0] == 0
+
+    os.remove(f"{app.config['DATABASE']}.migrate.lock")
+
+
+def test_upgrade_skips_empty_database(tmp_path):
+    database = str(tmp_path / "empty.sqlite")
+    app = create_app({"TESTING": True, "DATABASE": database})
+
+    with app.app_context():
+        assert upgrade_db() is None
+        assert get_db().execute("PRAGMA user_version").fetchone()[0] == 0
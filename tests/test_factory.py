@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 from flaskr import create_app
 
 
@@ -9,3 +12,32 @@ def test_config():
 def test_hello(client):
     response = client.get("/hello")
     assert response.data == b"Hello, World!"
+
+
+def test_warm_up(app):
+    from flaskr.wsgi import warm_up
+
+    warm_up(app)
+    assert len(app.jinja_env.cache) == len(app.jinja_env.list_templates())
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.split()
+
+
+def test_web_does_not_import_pil():
+    loaded = run_python(
+        "import sys; from flaskr import create_app; create_app({'TESTING': True});"
+        " print('PIL' in sys.modules)"
+    )
+    assert loaded == ["False"]
+
+
+def test_worker_app_is_minimal():
+    loaded = run_python(
+        "import sys; from flaskr import create_worker_app; create_worker_app();"
+        " print('flaskr.tasks' in sys.modules, 'flaskr.review' in sys.modules)"
+    )
+    assert loaded == ["True", "False"]
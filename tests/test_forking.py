@@ -0,0 +1,29 @@
+import os
+
+from flaskr.forking import per_process
+
+
+class Thing:
+    def __init__(self, name="a"):
+        self.pid = os.getpid()
+        self.name = name
+
+
+def test_per_process(monkeypatch):
+    store = {}
+    first = per_process(store, "thing", Thing)
+    assert per_process(store, "thing", Thing) is first
+
+    # Obiekt z innego procesu (odziedziczony po forku) jest zastępowany
+    monkeypatch.setattr(os, "getpid", lambda: first.pid + 1)
+    second = per_process(store, "thing", Thing)
+    assert second is not first
+    assert store["thing"] is second
+
+
+def test_per_process_stale():
+    store = {"thing": Thing("old")}
+    thing = per_process(
+        store, "thing", lambda: Thing("new"), stale=lambda t: t.name == "old"
+    )
+    assert thing.name == "new"
@@ -0,0 +1,155 @@
+import time
+
+import pytest
+from flaskr.monitor import (
+    HealthMonitor,
+    check_disk,
+    check_queues,
+    check_results,
+    check_workers,
+)
+
+
+def fail():
+    raise ConnectionError("broker down")
+
+
+@pytest.fixture
+def monitor(app):
+    checks = {
+        name: lambda: {"status": "ok"}
+        for name in ("broker", "queues", "workers", "disk", "results")
+    }
+    monitor = HealthMonitor(checks)
+    # Bez start() - testy same wywołują run_checks(), wątek nie jest potrzebny
+    app.extensions["health_monitor"] = monitor
+    return monitor
+
+
+def test_monitor_snapshot(monitor):
+    assert monitor.snapshot()["broker"]["status"] == "unknown"
+
+    monitor.checks["broker"] = fail
+    monitor.run_checks()
+    snapshot = monitor.snapshot()
+    assert snapshot["broker"] == {"status": "error", "error": "broker down", "age_s": 0}
+    assert snapshot["disk"]["status"] == "ok"
+
+    monitor.stale_after = -1
+    assert monitor.snapshot()["disk"]["status"] == "stale"
+
+
+def test_monitor_thread(monitor):
+    monitor.interval = 0.01
+    monitor.start()
+    try:
+        deadline = time.monotonic() + 5
+        while monitor.snapshot()["disk"]["status"] == "unknown":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        monitor.stop()
+
+
+def test_monitor_shared_state(tmp_path):
+    path = str(tmp_path / "health.json")
+    calls = []
+
+    def check():
+        calls.append(1)
+        return {"status": "ok"}
+
+    leader = HealthMonitor({"broker": check}, state_path=path)
+    follower = HealthMonitor({"broker": check}, state_path=path)
+
+    # Sprawdzenia wykonuje tylko proces trzymający blokadę
+    assert leader.is_leader()
+    assert not follower.is_leader()
+
+    leader.run_checks()
+    leader.save()
+    follower.load()
+    assert follower.snapshot()["broker"]["status"] == "ok"
+    assert len(calls) == 1
+
+
+def test_readyz_startup_grace(client, monitor):
+    monitor.grace = 60
+    assert client.get("/readyz").status_code == 200
+
+    monitor.checks["disk"] = lambda: {"status": "error"}
+    monitor.run_checks()
+    assert client.get("/readyz").status_code == 500
+
+
+def test_readyz(client, monitor):
+    assert client.get("/readyz").status_code == 500
+
+    monitor.run_checks()
+    assert client.get("/readyz").status_code == 200
+
+    # Martwe workery psują /health, ale nie gotowość węzła do przyjmowania uploadów
+    monitor.checks["workers"] = fail
+    monitor.run_checks()
+    assert client.get("/readyz").status_code == 200
+
+    monitor.checks["queues"] = lambda: {"status": "error"}
+    monitor.run_checks()
+    response = client.get("/readyz")
+    assert response.status_code == 500
+    assert response.json["failed"] == ["queues"]
+
+
+def test_health(client, monitor):
+    monitor.checks["results"] = lambda: {"status": "degraded", "latency_ms": 900}
+    monitor.run_checks()
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json["checks"]["database"] == "ok"
+    assert response.json["details"]["results"]["latency_ms"] == 900
+
+    monitor.checks["workers"] = fail
+    monitor.run_checks()
+    response = client.get("/health")
+    assert response.status_code == 500
+    assert response.json["checks"]["workers"] == "error"
+
+
+def test_check_disk(tmp_path):
+    assert check_disk([str(tmp_path)], 0)["status"] == "ok"
+    assert check_disk([str(tmp_path)], 1024**6)["status"] == "error"
+
+
+def test_check_results(app, tmp_path):
+    celery_app = app.extensions["celery"]
+    celery_app.conf.result_backend = f"file://{tmp_path}"
+
+    assert check_results(celery_app.backend, 10_000)["status"] == "ok"
+    assert check_results(celery_app.backend, -1)["status"] == "degraded"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_check_queues(app):
+    celery_app = app.extensions["celery"]
+    celery_app.conf.broker_url = "memory://"
+
+    with celery_app.connection_for_write() as connection:
+        channel = connection.default_channel
+        channel.queue_declare("high_priority")
+        channel.basic_publish(channel.prepare_message("x"), "", "high_priority")
+
+    result = check_queues(celery_app, 1.0, {"high_priority": 1})
+    assert result["status"] == "ok"
+    assert result["queues"]["high_priority"]["messages"] == 1
+
+    result = check_queues(celery_app, 1.0, {"high_priority": 0})
+    assert result["status"] == "error"
+
+
+def test_check_workers(app, monkeypatch):
+    control = app.extensions["celery"].control
+    monkeypatch.setattr(control, "ping", lambda timeout: [{"w1@host": {"ok": "pong"}}])
+    assert check_workers(app.extensions["celery"], 1.0, 1)["workers"] == ["w1@host"]
+
+    monkeypatch.setattr(control, "ping", lambda timeout: [])
+    assert check_workers(app.extensions["celery"], 1.0, 1)["status"] == "error"
@@ -0,0 +1,406 @@
+import io
+import os
+
+import pytest
+from flaskr.db import get_db
+from flaskr.jobs import JobRecorder, create_job
+from flaskr.producer import PublishMetrics
+from flaskr.results import RESULT_FIELDS, pack_result, unpack_result
+from flaskr.retention import find_file, shard_path
+from flaskr.status import wait_slots
+
+RESULT = "ab12cd34.png"
+
+
+@pytest.fixture
+def result_file(app, tmp_path):
+    app.instance_path = str(tmp_path)
+    path = shard_path(os.path.join(str(tmp_path), "processed"), "vip", RESULT)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"0123456789")
+    return path
+
+
+def test_get_image(client, result_file):
+    response = client.get(f"/image/result/{RESULT}")
+    assert response.status_code == 200
+    assert response.data == b"0123456789"
+    assert response.headers["ETag"] == '"ab12cd34"'
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+
+def test_get_image_not_modified(client, result_file):
+    response = client.get(
+        f"/image/result/{RESULT}", headers={"If-None-Match": '"ab12cd34"'}
+    )
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_get_image_range(client, result_file):
+    response = client.get(f"/image/result/{RESULT}", headers={"Range": "bytes=2-4"})
+    assert response.status_code == 206
+    assert response.data == b"234"
+
+
+def test_get_image_accel_redirect(app, client, result_file):
+    app.config["RESULT_ACCEL_REDIRECT"] = "/protected/"
+    response = client.get(f"/image/result/{RESULT}")
+    assert response.headers["X-Accel-Redirect"] == f"/protected/vip/ab/{RESULT}"
+    assert response.data == b""
+
+
+def test_get_image_missing(client, result_file):
+    assert client.get("/image/result/ffff.png").status_code == 404
+
+
+@pytest.fixture
+def memory_broker(app, tmp_path):
+    app.instance_path = str(tmp_path)
+    app.extensions["celery"].conf.broker_url = "memory://"
+
+
+@pytest.mark.parametrize(
+    ("login", "queue"), ((False, "low_priority"), (True, "high_priority"))
+)
+def test_upload(app, client, auth, memory_broker, login, queue):
+    if login:
+        auth.login()
+
+    response = client.post(
+        "/image/upload", data={"file": (io.BytesIO(b"data"), "photo.png")}
+    )
+    assert response.status_code == 202
+    assert response.json["queue"] == queue
+
+    uploads = os.path.join(app.instance_path, "uploads")
+    assert find_file(uploads, response.json["filename"]) is not None
+    assert app.extensions["publisher"].metrics.snapshot()["count"] == 1
+
+    with app.app_context():
+        job = (
+            get_db()
+            .execute("SELECT * FROM job WHERE task_id = ?", (response.json["task_id"],))
+            .fetchone()
+        )
+    assert job["queue"] == queue
+    assert job["user_id"] == (1 if login else None)
+    assert job["input_bytes"] == 4
+    assert job["status"] == "PENDING"
+
+
+@pytest.mark.parametrize(
+    ("error", "status"), ((TimeoutError, "UNKNOWN"), (ConnectionError, None))
+)
+def test_upload_publish_error(app, client, memory_broker, monkeypatch, error, status):
+    def publish_task(*args):
+        raise error()
+
+    monkeypatch.setattr("flaskr.image.publish_task", publish_task)
+
+    with pytest.raises(error):
+        client.post("/image/upload", data={"file": (io.BytesIO(b"data"), "a.png")})
+
+    # Po timeoucie potwierdzenia wiadomość mogła dotrzeć do brokera - wiersz zostaje
+    with app.app_context():
+        row = get_db().execute("SELECT status FROM job").fetchone()
+    assert (row and row["status"]) == status
+
+
+def test_upload_confirm_timeout_after_worker(app, client, memory_broker, monkeypatch):
+    def publish_task(task, args, queue, task_id=None):
+        # Potwierdzenie nie przyszło, ale worker zdążył już zakończyć zadanie
+        db = get_db()
+        db.execute("UPDATE job SET status = 'SUCCESS' WHERE task_id = ?", (task_id,))
+        db.commit()
+        raise TimeoutError()
+
+    monkeypatch.setattr("flaskr.image.publish_task", publish_task)
+
+    with pytest.raises(TimeoutError):
+        client.post("/image/upload", data={"file": (io.BytesIO(b"data"), "a.png")})
+
+    with app.app_context():
+        row = get_db().execute("SELECT status FROM job").fetchone()
+    assert row["status"] == "SUCCESS"
+
+
+@pytest.mark.parametrize(
+    ("data", "error"),
+    (
+        ({}, b"No file part"),
+        ({"file": (io.BytesIO(b""), "")}, b"No selected file"),
+        ({"file": (io.BytesIO(b"data"), "notes.txt")}, b"Invalid file type"),
+        (
+            {"file": (io.BytesIO(b"data"), "photo.png"), "operation": "{"},
+            b"valid JSON",
+        ),
+        (
+            {
+                "file": (io.BytesIO(b"data"), "photo.png"),
+                "operation": '{"kind": "swirl"}',
+            },
+            b"Kind must be one of",
+        ),
+        (
+            {
+                "file": (io.BytesIO(b"data"), "photo.png"),
+                "operation": '{"regions": [[10, 10, 5, 20]]}',
+            },
+            b"Invalid region",
+        ),
+    ),
+)
+def test_upload_validate_input(client, data, error):
+    response = client.post("/image/upload", data=data)
+    assert response.status_code == 400
+    assert error in response.data
+
+
+def test_publish_metrics():
+    metrics = PublishMetrics()
+    for ms in (1, 2, 3, 4):
+        metrics.observe(ms / 1000)
+    metrics.observe(0.01, error=True)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["errors"] == 1
+    assert snapshot["max_ms"] == pytest.approx(10)
+    assert snapshot["avg_ms"] == pytest.approx(4)
+
+
+def test_jobs(app, client, auth):
+    with app.app_context():
+        for i in range(3):
+            create_job(f"task-{i}", 1, f"{i}.png", f"hash-{i % 2}", "high", "vip", 10)
+        create_job("other", 2, "x.png", "hash-0", "high", "vip", 10)
+
+    assert client.get("/image/jobs").headers["Location"] == "/auth/login"
+
+    auth.login()
+    response = client.get("/image/jobs?limit=2")
+    assert [job["task_id"] for job in response.json["jobs"]] == ["task-2", "task-1"]
+
+    response = client.get(f"/image/jobs?before={response.json['next_cursor']}")
+    assert [job["task_id"] for job in response.json["jobs"]] == ["task-0"]
+    assert response.json["next_cursor"] is None
+
+    response = client.get("/image/jobs?hash=hash-0")
+    assert [job["task_id"] for job in response.json["jobs"]] == ["task-2", "task-0"]
+
+
+def test_job_recorder(app, client, auth):
+    with app.app_context():
+        create_job("task", 1, "a.png", "hash", "high", "vip", 10)
+
+    recorder = JobRecorder(app.config["DATABASE"], flush_interval=60)
+    recorder.started("task")
+    recorder.finished("task", "SUCCESS", "ab12cd34.png", 5)
+    recorder.close()
+
+    auth.login()
+    (job,) = client.get("/image/jobs").json["jobs"]
+    assert job["status"] == "SUCCESS"
+    assert job["output_bytes"] == 5
+    assert job["image_url"] == "/image/result/ab12cd34.png"
+    assert job["process_ms"] >= 0
+
+
+@pytest.fixture
+def base_job(app, result_file, memory_broker):
+    # result_file to wynik w tierze vip; źródło leży obok w uploads
+    source = shard_path(os.path.join(app.instance_path, "uploads"), "vip", "src.png")
+    os.makedirs(os.path.dirname(source))
+    with open(source, "wb") as f:
+        f.write(b"data")
+
+    with app.app_context():
+        operation = {"kind": "box", "radius": 2, "regions": [[0, 0, 8, 8]]}
+        create_job("base", 1, "src.png", "hash", "high", "vip", 4, operation)
+        db = get_db()
+        db.execute("UPDATE job SET status = 'SUCCESS', output_filename = ?", (RESULT,))
+        db.commit()
+    return source
+
+
+@pytest.mark.parametrize(
+    ("operation", "delta"),
+    (
+        ({"kind": "box", "radius": 2, "regions": [[0, 0, 8, 8], [9, 9, 12, 12]]}, True),
+        ({"kind": "box", "radius": 4, "regions": [[0, 0, 8, 8]]}, False),
+        ({"kind": "box", "radius": 2}, False),
+    ),
+)
+def test_edit(app, client, auth, base_job, operation, delta):
+    auth.login()
+    response = client.post("/image/edit", json={"base": RESULT, "operation": operation})
+    assert response.status_code == 202
+    assert response.json["filename"] == "src.png"
+    assert response.json["delta"] is delta
+
+    with app.app_context():
+        job = (
+            get_db()
+            .execute("SELECT * FROM job WHERE task_id = ?", (response.json["task_id"],))
+            .fetchone()
+        )
+    assert job["tier"] == "vip"
+    assert job["filename"] == "src.png"
+
+
+def test_edit_gif_is_not_delta(app, client, auth, base_job):
+    uploads = os.path.join(app.instance_path, "uploads")
+    os.renames(base_job, shard_path(uploads, "vip", "src.gif"))
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE job SET filename = 'src.gif'")
+        db.commit()
+
+    auth.login()
+    operation = {"kind": "box", "radius": 2, "regions": [[0, 0, 8, 8], [9, 9, 12, 12]]}
+    response = client.post("/image/edit", json={"base": RESULT, "operation": operation})
+    assert response.status_code == 202
+    assert response.json["delta"] is False
+
+
+def test_edit_requires_owner(app, client, auth, base_job):
+    operation = {"kind": "box", "radius": 2, "regions": [[0, 0, 1, 1]]}
+
+    response = client.post("/image/edit", json={"base": RESULT, "operation": operation})
+    assert response.headers["Location"] == "/auth/login"
+
+    # Cudzy wynik wygląda jak nieistniejący
+    auth.login("other", "other")
+    response = client.post("/image/edit", json={"base": RESULT, "operation": operation})
+    assert response.status_code == 404
+
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE job SET user_id = NULL")
+        db.commit()
+
+    auth.login()
+    response = client.post("/image/edit", json={"base": RESULT, "operation": operation})
+    assert response.status_code == 404
+
+
+def test_edit_missing_base(app, client, auth, base_job):
+    auth.login()
+    response = client.post("/image/edit", json={"base": "missing.png"})
+    assert response.status_code == 404
+
+    os.remove(base_job)
+    response = client.post("/image/edit", json={"base": RESULT})
+    assert response.status_code == 410
+
+    response = client.post("/image/edit", json={"operation": {}})
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def backend(app, tmp_path):
+    celery_app = app.extensions["celery"]
+    celery_app.conf.result_backend = f"file://{tmp_path}"
+    backend = celery_app.backend
+    backend.store_result(
+        "done", pack_result(filename="ab12cd34.png", width=4, height=3), "SUCCESS"
+    )
+    backend.store_result("broken", ValueError("bad image"), "FAILURE")
+    return backend
+
+
+def test_task_status(client, backend):
+    response = client.get("/image/status/done")
+    assert response.json["status"] == "SUCCESS"
+    assert response.json["image_url"] == "/image/result/ab12cd34.png"
+    assert response.json["result"]["width"] == 4
+
+    response = client.get("/image/status/unknown")
+    assert response.json == {"task_id": "unknown", "status": "PENDING"}
+
+
+def test_result_schema():
+    packed = pack_result(filename="a.png", bytes=10, encode_ms=1.5)
+    assert len(packed) == len(RESULT_FIELDS)
+    assert unpack_result(packed)["encode_ms"] == 1.5
+    assert unpack_result({"filename": "old.png"}) == {"filename": "old.png"}
+
+
+def test_bulk_status(client, backend):
+    response = client.post(
+        "/image/status", json={"task_ids": ["done", "broken", "waiting", "done"]}
+    )
+    tasks = response.json["tasks"]
+    assert [task["status"] for task in tasks] == ["SUCCESS", "FAILURE", "PENDING"]
+    assert tasks[1]["error"] == "bad image"
+
+
+def test_bulk_status_wait(app, client, backend, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("flaskr.status.time.sleep", sleeps.append)
+
+    # "any" is already satisfied by the finished task
+    client.post("/image/status", json={"task_ids": ["done", "waiting"], "wait": "any"})
+    assert sleeps == []
+
+    response = client.post(
+        "/image/status",
+        json={"task_ids": ["done", "waiting"], "wait": "all", "timeout": 0.05},
+    )
+    assert response.json["tasks"][1]["status"] == "PENDING"
+    assert sleeps
+
+    sleeps.clear()
+    for wait in ("any", "all"):
+        response = client.post(
+            "/image/status", json={"task_ids": [], "wait": wait, "timeout": 5}
+        )
+        assert response.json == {"tasks": []}
+    assert sleeps == []
+
+
+def test_bulk_status_wait_is_capped(app, client, backend, monkeypatch):
+    calls = []
+
+    def wait_for_states(task_ids, wait, timeout):
+        calls.append((wait, timeout))
+        return {task_id: {"status": "PENDING"} for task_id in task_ids}
+
+    monkeypatch.setattr("flaskr.image.wait_for_states", wait_for_states)
+    body = {"task_ids": ["waiting"], "wait": "all", "timeout": 600}
+
+    client.post("/image/status", json=body)
+    assert calls == [("all", app.config["STATUS_MAX_WAIT"])]
+    assert app.config["STATUS_MAX_WAIT"] < 30
+
+    # Wszystkie miejsca na czekanie zajęte - odpowiedź od razu, bez czekania
+    with app.app_context():
+        slots = wait_slots()
+        for _ in range(app.config["STATUS_MAX_WAITERS"]):
+            assert slots.acquire(blocking=False)
+    client.post("/image/status", json=body)
+    assert calls[-1][0] is None
+
+    for _ in range(app.config["STATUS_MAX_WAITERS"]):
+        slots.release()
+    client.post("/image/status", json=body)
+    assert calls[-1][0] == "all"
+
+
+@pytest.mark.parametrize(
+    ("data", "error"),
+    (
+        ({}, b"task_ids"),
+        ([1, 2], b"JSON object"),
+        ({"task_ids": [1, 2]}, b"task_ids"),
+        ({"task_ids": ["a"], "wait": "some"}, b"wait"),
+        ({"task_ids": ["a"], "timeout": "long"}, b"timeout"),
+    ),
+)
+def test_bulk_status_validate_input(client, data, error):
+    response = client.post("/image/status", json=data)
+    assert response.status_code == 400
+    assert error in response.data
@@ -0,0 +1,173 @@
+import io
+
+import pytest
+from PIL import Image
+
+from flaskr import imaging
+
+
+@pytest.fixture
+def arena():
+    imaging.configure_arena(blocks_max=8)
+    Image.core.reset_stats()
+    yield
+    Image.core.set_blocks_max(0)
+
+
+def png(size):
+    buf = io.BytesIO()
+    Image.new("RGB", size, "red").save(buf, format="PNG")
+    buf.seek(0)
+    return buf
+
+
+def test_arena_reuses_buffers(arena):
+    for _ in range(3):
+        with imaging.decode(png((64, 48))) as img:
+            with imaging.blur(img, radius=2) as blurred:
+                assert blurred.size == (64, 48)
+
+    assert imaging.arena_stats()["reused_blocks"] > 0
+
+
+def test_timer():
+    timer = imaging.Timer()
+    timer.lap("decode_ms")
+    timer.restart()
+    timer.lap("encode_ms")
+    assert set(timer.timings) == {"decode_ms", "encode_ms"}
+
+
+@pytest.mark.parametrize("kind", ("gaussian", "box", "motion", "pixelate"))
+def test_blur_regions(kind):
+    img = Image.effect_noise((64, 48), 64).convert("RGB")
+
+    with imaging.blur(img, radius=4, kind=kind, regions=[[8, 8, 24, 20]]) as out:
+        assert out.size == img.size
+        # Poza obszarem obraz jest nietknięty, w obszarze - rozmyty
+        outside, inside = (32, 0, 64, 48), (8, 8, 24, 20)
+        assert out.crop(outside).tobytes() == img.crop(outside).tobytes()
+        assert out.crop(inside).tobytes() != img.crop(inside).tobytes()
+
+
+def test_blur_region_matches_full_frame():
+    img = Image.effect_noise((64, 48), 64).convert("RGB")
+    region = (16, 16, 40, 32)
+
+    # Halo wystarcza, żeby wynik w obszarze był taki jak przy rozmyciu całości
+    with imaging.blur(img, radius=2, kind="box") as full:
+        with imaging.blur(img, radius=2, kind="box", regions=[region]) as part:
+            assert full.crop(region).tobytes() == part.crop(region).tobytes()
+
+
+def test_blur_palette_image():
+    img = Image.new("P", (16, 16))
+    with imaging.blur(img, radius=2) as out:
+        assert out.mode == "RGB"
+
+
+@pytest.mark.parametrize("kind", ("box", "motion", "pixelate"))
+def test_reblur_matches_full_job(kind):
+    img = Image.effect_noise((64, 48), 64).convert("RGB")
+    old = [[4, 4, 20, 20], [30, 10, 50, 30]]
+    new = [[4, 4, 20, 20], [36, 10, 56, 30], [10, 30, 30, 44]]
+    changed = [[30, 10, 50, 30], [36, 10, 56, 30], [10, 30, 30, 44]]
+
+    with imaging.blur(img, radius=3, kind=kind, regions=old) as previous:
+        with imaging.reblur(img, previous, changed, 3, kind, new) as patched:
+            with imaging.blur(img, radius=3, kind=kind, regions=new) as full:
+                assert patched.tobytes() == full.tobytes()
+
+
+ENCODER = dict(
+    format="WEBP",
+    animated="GIF",
+    lossless="PNG",
+    max_colors=256,
+    quality=80,
+    webp_method=4,
+    jpeg_progressive=True,
+    png_compress_level=6,
+)
+
+
+def photo(size=(64, 48)):
+    # Szum w każdym kanale osobno - tysiące kolorów jak na zdjęciu
+    return Image.merge("RGB", [Image.effect_noise(size, 64) for _ in range(3)])
+
+
+def test_choose_format():
+    img = photo()
+    assert imaging.choose_format(img, ENCODER) == "WEBP"
+    assert imaging.choose_format(img, {**ENCODER, "format": "JPEG"}) == "JPEG"
+
+    # JPEG nie ma kanału alfa
+    rgba = img.convert("RGBA")
+    assert imaging.choose_format(rgba, {**ENCODER, "format": "JPEG"}) == "WEBP"
+
+    with imaging.decode(png((8, 8))) as source:
+        assert imaging.choose_format(source, {**ENCODER, "format": "keep"}) == "PNG"
+
+
+def test_choose_format_lossless():
+    img = photo()
+    # Rozmyte tylko obszary bezstratnego źródła - reszta obrazu zostaje ostra
+    img.format = "PNG"
+    assert imaging.choose_format(img, ENCODER, [[0, 0, 8, 8]]) == "PNG"
+    assert imaging.choose_format(img, ENCODER) == "WEBP"
+
+    # Zdjęcie JPEG jest już stratne - obszary nie wymuszają dużego PNG
+    img.format = "JPEG"
+    assert imaging.choose_format(img, ENCODER, [[0, 0, 8, 8]]) == "WEBP"
+
+    # Grafiki: paleta i mało kolorów (np. zrzut ekranu z tekstem)
+    assert imaging.choose_format(img.convert("P"), ENCODER) == "PNG"
+    screenshot = Image.new("RGB", (1024, 768), "white")
+    screenshot.paste((0, 0, 0), (10, 10, 500, 20))
+    assert imaging.choose_format(screenshot, ENCODER) == "PNG"
+
+
+@pytest.mark.parametrize("format", ("GIF", "WEBP"))
+def test_encode_animation(format):
+    buf = io.BytesIO()
+    frames = [Image.effect_noise((32, 24), 64).convert("P") for _ in range(3)]
+    frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:])
+    buf.seek(0)
+
+    with imaging.decode(buf) as img:
+        assert imaging.choose_format(img, {**ENCODER, "animated": format}) == format
+        frames, durations = imaging.blur_frames(img, radius=2)
+
+    out = io.BytesIO()
+    imaging.encode(frames[0], out, format, ENCODER, frames[1:], durations)
+    with Image.open(out) as result:
+        assert result.format == format
+        assert result.n_frames == 3
+
+
+def test_encode_lossy_is_smaller():
+    img = Image.effect_noise((128, 96), 64).convert("RGB")
+    sizes = {}
+
+    with imaging.blur(img, radius=4) as blurred:
+        for format in ("PNG", "WEBP", "JPEG"):
+            out = io.BytesIO()
+            imaging.encode(blurred, out, format, ENCODER)
+            sizes[format] = out.tell()
+
+    assert sizes["WEBP"] < sizes["PNG"]
+    assert sizes["JPEG"] < sizes["PNG"]
+
+
+@pytest.mark.parametrize("mode", ("CMYK", "F", "YCbCr"))
+@pytest.mark.parametrize("format", ("PNG", "WEBP", "JPEG"))
+def test_encode_converts_unsupported_modes(mode, format):
+    img = photo().convert(mode)
+
+    with imaging.blur(img, radius=2, regions=[[4, 4, 20, 20]]) as blurred:
+        out = io.BytesIO()
+        imaging.encode(blurred, out, format, ENCODER)
+
+    out.seek(0)
+    with Image.open(out) as saved:
+        assert saved.mode in ("L", "RGB")
@@ -0,0 +1,52 @@
+import pytest
+
+from flaskr.operations import (
+    DEFAULT_OPERATION,
+    OperationError,
+    can_patch,
+    changed_regions,
+    parse_operation,
+)
+
+
+def test_parse_operation():
+    assert parse_operation(None) == DEFAULT_OPERATION
+    assert parse_operation('{"kind": "motion", "regions": [[0, 0, 4, 4]]}') == {
+        "kind": "motion",
+        "radius": 10,
+        "regions": [[0, 0, 4, 4]],
+    }
+
+
+@pytest.mark.parametrize(
+    ("raw", "error"),
+    (
+        ("[]", "JSON object"),
+        ('{"angle": 3}', "Unknown operation keys"),
+        ('{"radius": 0}', "Radius must be between"),
+        ('{"radius": "5"}', "Radius must be an integer"),
+        ('{"regions": [[0, 0, 4]]}', "Each region"),
+    ),
+)
+def test_parse_operation_validate(raw, error):
+    with pytest.raises(OperationError, match=error):
+        parse_operation(raw)
+
+
+def test_changed_regions():
+    previous = parse_operation('{"regions": [[0, 0, 4, 4], [5, 5, 9, 9]]}')
+
+    operation = parse_operation('{"regions": [[0, 0, 4, 4], [6, 6, 9, 9]]}')
+    assert changed_regions(previous, operation) == [[5, 5, 9, 9], [6, 6, 9, 9]]
+
+    operation = parse_operation('{"radius": 3, "regions": [[0, 0, 4, 4]]}')
+    assert changed_regions(previous, operation) is None
+    assert changed_regions(previous, DEFAULT_OPERATION) is None
+
+
+def test_can_patch():
+    assert can_patch("src.jpg", "ab12.png")
+    # Stratny poprzedni wynik albo możliwa animacja - pełne zadanie
+    assert not can_patch("src.jpg", "ab12.webp")
+    assert not can_patch("src.png", "ab12.jpg")
+    assert not can_patch("src.gif", "ab12.png")
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+from flaskr.producer import _ConfirmBatcher
+
+
+class FakeChannel:
+    def __init__(self):
+        self.events = {"basic_ack": set(), "basic_nack": set()}
+
+    def confirm_select(self):
+        pass
+
+    def ack(self, delivery_tag, multiple=False):
+        for callback in self.events["basic_ack"]:
+            callback(delivery_tag, multiple)
+
+
+class FakeConnection:
+    def __init__(self, on_drain):
+        self._channel = FakeChannel()
+        self.on_drain = on_drain
+        self.closed = False
+
+    def channel(self):
+        return self._channel
+
+    def drain_events(self, timeout):
+        self.on_drain(self._channel, timeout)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTask:
+    def apply_async(self, args, queue, task_id, producer):
+        return task_id
+
+
+def make_batcher(on_drain=lambda channel, timeout: None, timeout=0.05):
+    connection = FakeConnection(on_drain)
+    celery_app = SimpleNamespace(
+        connection_for_write=lambda: connection,
+        amqp=SimpleNamespace(Producer=lambda channel: object()),
+    )
+    batcher = _ConfirmBatcher(celery_app, window=0.001, size=8, timeout=timeout)
+    return batcher, connection
+
+
+def pending(batcher, count):
+    futures = [Future() for _ in range(count)]
+    batcher._pending = {tag: (f, f"r{tag}") for tag, f in enumerate(futures, 1)}
+    return futures
+
+
+def test_settle_multiple():
+    batcher, _ = make_batcher()
+    first, second, third = pending(batcher, 3)
+
+    # multiple=True potwierdza wszystkie tagi do podanego włącznie
+    batcher._on_ack(2, True)
+    assert first.result(0) == "r1"
+    assert second.result(0) == "r2"
+    assert not third.done()
+
+    batcher._on_ack(3, False)
+    assert third.result(0) == "r3"
+    assert batcher._pending == {}
+
+    # Potwierdzenie nieznanego (już rozliczonego) tagu jest ignorowane
+    batcher._on_ack(3, False)
+
+
+def test_nack():
+    batcher, _ = make_batcher()
+    first, second = pending(batcher, 2)
+
+    batcher._on_nack(1, False)
+    with pytest.raises(RuntimeError, match="rejected"):
+        first.result(0)
+    assert not second.done()
+
+
+def test_submit_acked():
+    def on_drain(channel, timeout):
+        channel.ack(1, multiple=True)
+
+    batcher, _ = make_batcher(on_drain)
+    assert batcher.submit(FakeTask(), [], "high_priority", "t1") == "t1"
+
+
+def test_submit_timeout_resets_channel():
+    def on_drain(channel, timeout):
+        time.sleep(timeout)
+
+    batcher, connection = make_batcher(on_drain)
+
+    with pytest.raises(TimeoutError):
+        batcher.submit(FakeTask(), [], "high_priority", "t1")
+
+    # Kanał po błędzie jest zamykany, następna paczka otwiera nowy
+    deadline = time.monotonic() + 1
+    while not connection.closed:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert batcher._channel is None
+    assert batcher._pending == {}
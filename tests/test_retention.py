@@ -0,0 +1,169 @@
+import os
+
+from flaskr.db import get_db
+from flaskr.retention import (
+    SHARD_COUNT,
+    TMP_MAX_AGE,
+    find_file,
+    run_sweep,
+    shard_path,
+    sweep,
+)
+
+CONFIG = {
+    "ttl": {"vip": 100, "anon": 10},
+    "max_bytes": {"vip": None, "anon": None},
+    "shards_per_sweep": SHARD_COUNT,
+}
+
+
+def write_file(folder, tier, filename, size=1, age=0, now=1000):
+    path = shard_path(folder, tier, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (now - age, now - age))
+    return path
+
+
+def test_shard_path(tmp_path):
+    path = shard_path(str(tmp_path), "vip", "ab12.png")
+    assert path == os.path.join(str(tmp_path), "vip", "ab", "ab12.png")
+
+    write_file(str(tmp_path), "anon", "cd34.png")
+    assert find_file(str(tmp_path), "cd34.png").endswith(
+        os.path.join("anon", "cd", "cd34.png")
+    )
+    assert find_file(str(tmp_path), "ef56.png") is None
+
+
+def test_sweep_ttl_per_tier(tmp_path):
+    processed = os.path.join(str(tmp_path), "processed")
+    vip = write_file(processed, "vip", "aa01.png", age=50)
+    anon = write_file(processed, "anon", "aa02.png", age=50)
+    fresh = write_file(processed, "anon", "aa03.png", age=5)
+
+    stats = sweep(str(tmp_path), CONFIG, now=1000)
+
+    assert os.path.exists(vip)
+    assert not os.path.exists(anon)
+    assert os.path.exists(fresh)
+    assert stats["expired"] == 1
+    assert stats["wrapped"]
+
+
+def test_sweep_size_eviction(tmp_path):
+    config = dict(CONFIG, max_bytes={"vip": None, "anon": 15})
+    uploads = os.path.join(str(tmp_path), "uploads")
+    oldest = write_file(uploads, "anon", "bb01.png", size=10, age=3)
+    newest = write_file(uploads, "anon", "bb02.png", size=10, age=1)
+
+    stats = sweep(str(tmp_path), config, now=1000)
+
+    assert not os.path.exists(oldest)
+    assert os.path.exists(newest)
+    assert stats["evicted"] == 1
+    assert stats["freed"] == 10
+
+
+def test_sweep_size_limit_is_per_tier(tmp_path):
+    # Jeden duży plik mieści się w limicie tieru, choć przekracza 1/256 limitu
+    config = dict(CONFIG, max_bytes={"vip": None, "anon": 100})
+    uploads = os.path.join(str(tmp_path), "uploads")
+    processed = os.path.join(str(tmp_path), "processed")
+    big = write_file(uploads, "anon", "cc01.png", size=60, age=3)
+
+    assert sweep(str(tmp_path), config, now=1000)["evicted"] == 0
+    assert os.path.exists(big)
+
+    # Uploady i wyniki liczą się do wspólnego limitu, zapamiętanego między
+    # przejściami - tu przepełnia go dopiero shard odwiedzony później
+    later = write_file(processed, "anon", "dd01.png", size=60, age=1)
+    stats = sweep(str(tmp_path), config, now=1000)
+
+    assert stats["evicted"] == 1
+    assert os.path.exists(big)
+    assert not os.path.exists(later)
+
+
+def test_sweep_does_not_evict_young_or_queued_files(tmp_path):
+    config = dict(CONFIG, max_bytes={"vip": None, "anon": 5}, min_age=2)
+    uploads = os.path.join(str(tmp_path), "uploads")
+    young = write_file(uploads, "anon", "ee01.png", size=10, age=1)
+    queued = write_file(uploads, "anon", "ee02.png", size=10, age=5)
+
+    stats = sweep(str(tmp_path), config, now=1000, keep={"ee02.png"})
+
+    assert os.path.exists(young)
+    assert os.path.exists(queued)
+    assert stats["evicted"] == 0
+
+    # Limit rozmiaru nie chroni przed TTL
+    stats = sweep(str(tmp_path), config, now=1020, keep={"ee02.png"})
+    assert not os.path.exists(queued)
+    assert stats["expired"] == 2
+
+
+def test_sweep_removes_stale_tmp_files(tmp_path):
+    folder = os.path.join(str(tmp_path), "processed", "anon")
+    os.makedirs(folder)
+    stale = os.path.join(folder, ".ff01.png.tmp")
+    fresh = os.path.join(folder, ".ff02.png.tmp")
+    for path, age in ((stale, TMP_MAX_AGE + 1), (fresh, 1)):
+        with open(path, "wb") as f:
+            f.write(b"x")
+        os.utime(path, (1000 - age, 1000 - age))
+
+    stats = sweep(str(tmp_path), CONFIG, shards=1, now=1000)
+
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    assert stats["expired"] == 1
+
+
+def test_sweep_is_incremental(tmp_path):
+    processed = os.path.join(str(tmp_path), "processed")
+    first = write_file(processed, "anon", "00aa.png", age=50)
+    later = write_file(processed, "anon", "02aa.png", age=50)
+
+    stats = sweep(str(tmp_path), CONFIG, shards=2, now=1000)
+    assert stats["next_shard"] == 2
+    assert not stats["wrapped"]
+    assert not os.path.exists(first)
+    assert os.path.exists(later)
+
+    sweep(str(tmp_path), CONFIG, shards=2, now=1000)
+    assert not os.path.exists(later)
+
+
+def test_sweep_storage_command(runner, monkeypatch):
+    calls = []
+
+    def fake_run_sweep(shards=None):
+        calls.append(shards)
+        return {"shards": SHARD_COUNT, "expired": 1, "evicted": 0, "freed": 5}
+
+    monkeypatch.setattr("flaskr.retention.run_sweep", fake_run_sweep)
+    result = runner.invoke(args=["sweep-storage", "--all"])
+    assert "1 expired" in result.output
+    assert calls == [SHARD_COUNT]
+
+
+def test_run_sweep_keeps_uploads_of_unfinished_jobs(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        "flaskr.retention.sweep",
+        lambda *args, **kwargs: calls.append(kwargs) or {"wrapped": False},
+    )
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            "INSERT INTO job (task_id, filename, content_hash, queue, tier,"
+            " input_bytes, enqueued) VALUES"
+            " ('t1', 'queued.png', 'h', 'low_priority', 'anon', 1, 'now'),"
+            " ('t2', 'done.png', 'h', 'low_priority', 'anon', 1, 'now')"
+        )
+        db.execute("UPDATE job SET finished = 'now' WHERE task_id = 't2'")
+        run_sweep(shards=1)
+
+    assert calls[0]["keep"] == {"queued.png"}
@@ -1,5 +1,5 @@
 import pytest
-from flaskr.db import get_db
+from flaskr.db import MIGRATIONS, get_db
 
 
 def test_index(client, auth):
@@ -100,3 +100,71 @@ def test_delete(client, auth, app):
         db = get_db()
         post = db.execute("SELECT * FROM post WHERE id = 1").fetchone()
         assert post is None
+
+
+def test_index_pagination(client, app):
+    app.config["POSTS_PER_PAGE"] = 2
+
+    with app.app_context():
+        db = get_db()
+        for day in (2, 3, 4):
+            db.execute(
+                "INSERT INTO post (title, body, author_id, created)"
+                " VALUES (?, '', 1, ?)",
+                (f"post {day}", f"2018-01-0{day} 00:00:00"),
+            )
+        db.commit()
+
+    response = client.get("/")
+    assert b"post 4" in response.data
+    assert b"post 3" in response.data
+    assert b"post 2" not in response.data
+    assert b"before=2018-01-03+00:00:00_3" in response.data
+
+    response = client.get("/?before=2018-01-03+00:00:00_3")
+    assert b"post 2" in response.data
+    assert b"test title" in response.data
+    assert b"post 3" not in response.data
+    assert b"before=" not in response.data
+
+
+def test_index_invalid_cursor(client):
+    assert client.get("/?before=garbage").status_code == 400
+
+
+def test_index_cache_invalidated(client, auth):
+    auth.login()
+    assert b"test title" in client.get("/").data
+
+    client.post("/1/update", data={"title": "updated", "body": ""})
+    response = client.get("/")
+    assert b"updated" in response.data
+    assert b"test title" not in response.data
+
+
+def test_index_cache_invalidated_by_other_process(app, client, auth):
+    auth.login()
+    assert b"test title" in client.get("/").data
+
+    # Zapis w innym workerze: lokalny cache zostaje, zmienia się tylko wersja
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE post SET title = 'elsewhere' WHERE id = 1")
+        db.execute("UPDATE cache_version SET version = version + 1")
+        db.commit()
+
+    assert b"elsewhere" in client.get("/").data
+
+
+def test_migrate_db_command(runner, app):
+    with app.app_context():
+        result = runner.invoke(args=["migrate-db"])
+        assert f"version {len(MIGRATIONS)}" in result.output
+
+        indexes = {
+            row["name"]
+            for row in get_db().execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        }
+        assert {"post_created_id", "post_author_id"} <= indexes